@@ -16,13 +16,20 @@ bl_info = {
     "description": "Quality of life shortcuts for nodetrees",
     "author": "Quackers",
     "version": (1, 0),
-    "blender": (3, 0, 0),
+    "blender": (3, 3, 0),
     "location": "Node Editor > N Panel > Utils",
     "category": "Node",
 }
 
-from . import operators, ui, keymaps, prefs
-modules = (operators, ui, keymaps, prefs)
+# Worker processes of the tree analysis import this package without bpy, only tree_analysis is usable there
+try:
+    import bpy
+except ImportError:
+    bpy = None
+
+if bpy is not None:
+    from . import operators, ui, keymaps, prefs
+    modules = (operators, ui, keymaps, prefs)
 
 def register():
     for module in modules:
@@ -8,19 +8,49 @@ from .operators import (
     NODEUTILS_OT_LABEL_REROUTES,
     NODEUTILS_OT_RECENTER_NODES,
     NODEUTILS_OT_TOGGLE_UNUSED_SOCKETS,
+    NODEUTILS_OT_ENABLE_PERFORMANCE_MODE,
+    NODEUTILS_OT_RESTORE_PERFORMANCE_MODE,
     NODEUTILS_OT_SWITCH_SELECT_TYPE,
     NODEUTILS_OT_SWITCH_VIEWER_DOMAIN,
     NODEUTILS_OT_PIE_MENU_SWITCH_VIEWER_DOMAIN,
     NODEUTILS_MT_SWITCH_VIEWER_DOMAIN_OPTIONS,
     NODEUTILS_OT_SWITCH_VIEWER_DOMAIN_INVOKE_MENU,
+    NODEUTILS_OT_COLLAPSE_REROUTES,
+    NODEUTILS_OT_MERGE_DUPLICATE_NODES,
+    NODEUTILS_OT_DIFF_TREES,
+    NODEUTILS_OT_ANALYZE_TREES,
+    NODEUTILS_OT_FIND_REPEATED_SUBGRAPHS,
+    NODEUTILS_OT_FACTOR_REPEATED_SUBGRAPH,
+    NODEUTILS_OT_PROFILE_TREE,
+    NODEUTILS_OT_SELECT_FRAME_CONTENTS,
+    NODEUTILS_OT_SHRINK_FRAMES,
+    NODEUTILS_OT_FRAME_APPLY,
+    NODEUTILS_OT_AUTO_LAYOUT,
+    NODEUTILS_OT_ALIGN_NODES,
+    NODEUTILS_OT_DISTRIBUTE_NODES,
+    NODEUTILS_OT_SEARCH_NODES,
+    NODEUTILS_OT_FIT_NODE_WIDTH,
+    NODEUTILS_OT_SAVE_LAYOUT,
+    NODEUTILS_OT_RESTORE_LAYOUT,
+    NODEUTILS_OT_SAVE_SELECTION_SET,
+    NODEUTILS_OT_RECALL_SELECTION_SET,
+    NODEUTILS_OT_SELECTION_HISTORY,
+    NODEUTILS_OT_COPY_FROM_ACTIVE,
+    NODEUTILS_OT_RUN_ACROSS_TREES,
 )
 
 addon_keymaps = []
 prefs_display = {}
 keymap_defs = (
+    (NODEUTILS_OT_SEARCH_NODES.bl_idname, 'NONE', None, 'Search Nodes', False, None,),
     (NODEUTILS_OT_SELECT_BY_TYPE.bl_idname, 'NONE', None, 'Select Nodes', False, (('select_target', 'NODES'),)),
     (NODEUTILS_OT_SELECT_BY_TYPE.bl_idname, 'NONE', None, 'Select Reroutes', False, (('select_target', 'REROUTES'),)),
     (NODEUTILS_OT_SELECT_BY_TYPE.bl_idname, 'NONE', None, 'Select Frames', False, (('select_target', 'FRAMES'),)),
+    (NODEUTILS_OT_SAVE_SELECTION_SET.bl_idname, 'NONE', 'Selection Sets', 'Save Selection Set', False, None,),
+    (NODEUTILS_OT_RECALL_SELECTION_SET.bl_idname, 'NONE', 'Selection Sets', 'Recall Selection Set', False, None,),
+    (NODEUTILS_OT_SELECTION_HISTORY.bl_idname, 'NONE', 'Selection Sets', 'Previous Selection', False, (('direction', 'BACK'),)),
+    (NODEUTILS_OT_SELECTION_HISTORY.bl_idname, 'NONE', 'Selection Sets', 'Next Selection', False, (('direction', 'FORWARD'),)),
+    (NODEUTILS_OT_SELECT_FRAME_CONTENTS.bl_idname, 'NONE', None, 'Select Frame Contents', False, None,),
     (NODEUTILS_OT_SWITCH_SELECT_TYPE.bl_idname, 'NONE', None, 'Switch to First', False, (('switch_mode', 'SWITCH_TO_FIRST'),)),
     (NODEUTILS_OT_SWITCH_SELECT_TYPE.bl_idname, 'NONE', None, 'Switch to Last', False, (('switch_mode', 'SWITCH_TO_LAST'),)),
     (NODEUTILS_OT_SWITCH_SELECT_TYPE.bl_idname, 'NONE', None, 'Cycle Up', True, (('switch_mode', 'CYCLE_UP'),)),
@@ -28,21 +58,56 @@ keymap_defs = (
     (NODEUTILS_OT_NORMALIZE_NODE_WIDTH.bl_idname, 'NONE', None, 'By Max', False, (('normalize_type', 'MAX'),)),
     (NODEUTILS_OT_NORMALIZE_NODE_WIDTH.bl_idname, 'NONE', None, 'By Min', False, (('normalize_type', 'MIN'),)),
     (NODEUTILS_OT_NORMALIZE_NODE_WIDTH.bl_idname, 'NONE', None, 'By Average', False, (('normalize_type', 'AVERAGE'),)),
+    (NODEUTILS_OT_FIT_NODE_WIDTH.bl_idname, 'NONE', None, 'Fit to Content', False, (('normalize', 'NONE'),)),
+    (NODEUTILS_OT_FIT_NODE_WIDTH.bl_idname, 'NONE', None, 'Fit to Content per Column', False, (('normalize', 'COLUMN'),)),
     (NODEUTILS_OT_LABEL_REROUTES.bl_idname, 'NONE', None, 'By Input', False, (('check_by', 'INPUT'),)),
     (NODEUTILS_OT_LABEL_REROUTES.bl_idname, 'NONE', None, 'By Output', False, (('check_by', 'OUTPUT'),)),
+    (NODEUTILS_OT_COLLAPSE_REROUTES.bl_idname, 'NONE', None, 'Collapse Reroutes', False, None,),
     (NODEUTILS_OT_TOGGLE_UNUSED_SOCKETS.bl_idname, 'NONE', None, 'Toggle Inputs', False, (('sockets_to_hide', 'INPUT'),)),
     (NODEUTILS_OT_TOGGLE_UNUSED_SOCKETS.bl_idname, 'NONE', None, 'Toggle Outputs', False, (('sockets_to_hide', 'OUTPUT'),)),
+    (NODEUTILS_OT_ENABLE_PERFORMANCE_MODE.bl_idname, 'NONE', 'Performance Mode', 'Enable', False, None,),
+    (NODEUTILS_OT_RESTORE_PERFORMANCE_MODE.bl_idname, 'NONE', 'Performance Mode', 'Restore', False, None,),
     (NODEUTILS_OT_SWITCH_VIEWER_DOMAIN.bl_idname, 'NONE', None, 'Switch to First', False, (('switch_mode', 'SWITCH_TO_FIRST'),)),
     (NODEUTILS_OT_SWITCH_VIEWER_DOMAIN.bl_idname, 'NONE', None, 'Switch to Last', False, (('switch_mode', 'SWITCH_TO_LAST'),)),
-    (NODEUTILS_OT_SWITCH_VIEWER_DOMAIN.bl_idname, 'NONE', None, 'Cycle Up', False, (('switch_mode', 'CYCLE_UP'),)),
-    (NODEUTILS_OT_SWITCH_VIEWER_DOMAIN.bl_idname, 'NONE', None, 'Cycle Down', False, (('switch_mode', 'CYCLE_DOWN'),)),
+    (NODEUTILS_OT_SWITCH_VIEWER_DOMAIN.bl_idname, 'NONE', None, 'Cycle Up', True, (('switch_mode', 'CYCLE_UP'),)),
+    (NODEUTILS_OT_SWITCH_VIEWER_DOMAIN.bl_idname, 'NONE', None, 'Cycle Down', True, (('switch_mode', 'CYCLE_DOWN'),)),
     (NODEUTILS_OT_SWITCH_VIEWER_DOMAIN_INVOKE_MENU.bl_idname, 'NONE', None, 'Invoke Pie Menu', False, None,),
     (NODEUTILS_OT_BATCH_LABEL.bl_idname, 'NONE', 'Batch Operations', 'Set Labels', False, None,),
     (NODEUTILS_OT_BATCH_LABEL.bl_idname, 'NONE', 'Batch Operations', 'Set Labels', False, None,),
     (NODEUTILS_OT_SET_WIDTH.bl_idname, 'NONE', 'Batch Operations', '', False, None,),
+    (NODEUTILS_OT_COPY_FROM_ACTIVE.bl_idname, 'NONE', 'Batch Operations', 'Copy from Active', False, None,),
     (NODEUTILS_OT_SET_COLOR.bl_idname, 'NONE', 'Batch Operations', 'Set Color', False, (('color_opmode', 'SET_COLOR'),),),
     (NODEUTILS_OT_SET_COLOR.bl_idname, 'NONE', 'Batch Operations', 'Clear Color', False, (('color_opmode', 'CLEAR_COLOR'),),),
     (NODEUTILS_OT_RECENTER_NODES.bl_idname, 'NONE', 'Batch Operations', 'Center at Origin', False, None,),
+    (NODEUTILS_OT_AUTO_LAYOUT.bl_idname, 'NONE', 'Batch Operations', 'Auto Layout', False, None,),
+    (NODEUTILS_OT_MERGE_DUPLICATE_NODES.bl_idname, 'NONE', 'Batch Operations', 'Merge Duplicates', False, None,),
+    (NODEUTILS_OT_FIND_REPEATED_SUBGRAPHS.bl_idname, 'NONE', 'Batch Operations', 'Find Repeated Subgraphs', False, None,),
+    (NODEUTILS_OT_FACTOR_REPEATED_SUBGRAPH.bl_idname, 'NONE', 'Batch Operations', 'Factor Repeated Subgraph', False, None,),
+    (NODEUTILS_OT_RUN_ACROSS_TREES.bl_idname, 'NONE', 'Batch Operations', 'Run in All Editors', False, (('scope', 'EDITORS'),)),
+    (NODEUTILS_OT_RUN_ACROSS_TREES.bl_idname, 'NONE', 'Batch Operations', 'Run on All Group Levels', False, (('scope', 'PATH'),)),
+    (NODEUTILS_OT_ALIGN_NODES.bl_idname, 'NONE', 'Align', 'Left', False, (('align_mode', 'LEFT'),)),
+    (NODEUTILS_OT_ALIGN_NODES.bl_idname, 'NONE', 'Align', 'Horizontal Center', False, (('align_mode', 'CENTER_X'),)),
+    (NODEUTILS_OT_ALIGN_NODES.bl_idname, 'NONE', 'Align', 'Right', False, (('align_mode', 'RIGHT'),)),
+    (NODEUTILS_OT_ALIGN_NODES.bl_idname, 'NONE', 'Align', 'Top', False, (('align_mode', 'TOP'),)),
+    (NODEUTILS_OT_ALIGN_NODES.bl_idname, 'NONE', 'Align', 'Vertical Center', False, (('align_mode', 'CENTER_Y'),)),
+    (NODEUTILS_OT_ALIGN_NODES.bl_idname, 'NONE', 'Align', 'Bottom', False, (('align_mode', 'BOTTOM'),)),
+    (NODEUTILS_OT_DISTRIBUTE_NODES.bl_idname, 'NONE', 'Distribute', 'Equal Gaps X', False, (('distribute_mode', 'GAPS_X'),)),
+    (NODEUTILS_OT_DISTRIBUTE_NODES.bl_idname, 'NONE', 'Distribute', 'Equal Gaps Y', False, (('distribute_mode', 'GAPS_Y'),)),
+    (NODEUTILS_OT_DISTRIBUTE_NODES.bl_idname, 'NONE', 'Distribute', 'Equal Centers X', False, (('distribute_mode', 'CENTERS_X'),)),
+    (NODEUTILS_OT_DISTRIBUTE_NODES.bl_idname, 'NONE', 'Distribute', 'Equal Centers Y', False, (('distribute_mode', 'CENTERS_Y'),)),
+    (NODEUTILS_OT_DISTRIBUTE_NODES.bl_idname, 'NONE', 'Distribute', 'Grid', False, (('distribute_mode', 'GRID'),)),
+    (NODEUTILS_OT_SHRINK_FRAMES.bl_idname, 'NONE', 'Frames', 'Shrink to Fit', False, None,),
+    (NODEUTILS_OT_FRAME_APPLY.bl_idname, 'NONE', 'Frames', 'Normalize by Max', False, (('frame_operation', 'NORMALIZE_MAX'),)),
+    (NODEUTILS_OT_FRAME_APPLY.bl_idname, 'NONE', 'Frames', 'Normalize by Min', False, (('frame_operation', 'NORMALIZE_MIN'),)),
+    (NODEUTILS_OT_FRAME_APPLY.bl_idname, 'NONE', 'Frames', 'Normalize by Average', False, (('frame_operation', 'NORMALIZE_AVERAGE'),)),
+    (NODEUTILS_OT_FRAME_APPLY.bl_idname, 'NONE', 'Frames', 'Recenter Contents', False, (('frame_operation', 'RECENTER'),)),
+    (NODEUTILS_OT_SAVE_LAYOUT.bl_idname, 'NONE', 'Layout Snapshots', 'Save Snapshot', False, None,),
+    (NODEUTILS_OT_RESTORE_LAYOUT.bl_idname, 'NONE', 'Layout Snapshots', 'Restore Snapshot', False, None,),
+    (NODEUTILS_OT_PROFILE_TREE.bl_idname, 'NONE', 'Tree Profiler', 'Profile', False, (('heatmap', False),)),
+    (NODEUTILS_OT_PROFILE_TREE.bl_idname, 'NONE', 'Tree Profiler', 'Heatmap', False, (('heatmap', True),)),
+    (NODEUTILS_OT_ANALYZE_TREES.bl_idname, 'NONE', 'Tree Profiler', 'Analyze All Trees', False, None,),
+    (NODEUTILS_OT_DIFF_TREES.bl_idname, 'NONE', 'Tree Profiler', 'Compare Trees', False, (('highlight', False),)),
+    (NODEUTILS_OT_DIFF_TREES.bl_idname, 'NONE', 'Tree Profiler', 'Compare and Highlight', False, (('highlight', True),)),
 )
 
 
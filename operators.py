@@ -1,16 +1,78 @@
 from operator import ge
 import bpy
 from bpy.types import Operator
-from bpy.props import EnumProperty, StringProperty, IntProperty
+from bpy.props import EnumProperty, StringProperty, IntProperty, BoolProperty, FloatProperty
+from bpy.app.handlers import persistent
+from bpy_extras.io_utils import ExportHelper, ImportHelper
+import blf
+import numpy as np
 import itertools
+import base64
+import gzip
+import struct
+import zlib
+import time
+import hashlib
+import json
+import os
+import multiprocessing
+from array import array
+from collections import Counter, deque
+from functools import lru_cache
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from .tree_analysis import layered_layout, analyze_snapshot, analysis_parts
+
+tree_path_cache = {}
+tree_overrides = []
+
+def space_tree_path(space):
+    # Trees from the top level down to the one being edited, memoized per editor. The same group can be
+    # entered through different parents, so the memo is only used while it matches the editor's path.
+    path_items = space.path
+    cached = tree_path_cache.get(space.as_pointer())
+    if cached is not None:
+        if not path_items:
+            if cached == (space.node_tree,):
+                return cached
+        elif len(cached) == len(path_items) and all(tree == item.node_tree for tree, item in zip(cached, path_items)):
+            return cached
+    path = tuple(item.node_tree for item in path_items) or (space.node_tree,)
+
+    # Editors that were closed since the last change are forgotten
+    open_spaces = set(other.as_pointer() for window in bpy.context.window_manager.windows
+        for area in window.screen.areas for other in area.spaces if other.type == 'NODE_EDITOR')
+    for pointer in tuple(tree_path_cache):
+        if pointer not in open_spaces:
+            del tree_path_cache[pointer]
+    tree_path_cache[space.as_pointer()] = path
+    return path
+
+class override_tree():
+    # Makes get_nodes return the nodes of the given tree instead of the tree shown in the editor
+    def __init__(self, tree):
+        self.tree = tree
+
+    def __enter__(self):
+        tree_overrides.append(self.tree)
+        return self.tree
+
+    def __exit__(self, type, value, traceback):
+        tree_overrides.pop()
 
 def get_nodes(context):
-    tree = context.space_data.node_tree
-    if tree.nodes.active:
-        while tree.nodes.active != context.active_node:
-            tree = tree.nodes.active.node_tree
-    return tree.nodes
+    if tree_overrides:
+        return tree_overrides[-1].nodes
+    return space_tree_path(context.space_data)[-1].nodes
+
+@persistent
+def tree_path_cache_handler(*args):
+    # Undo and loading files reallocate node trees, so memoized paths would point at freed data
+    tree_path_cache.clear()
+
+def get_tree(context):
+    return get_nodes(context).id_data
 
 def fetch_user_preferences():
     ADD_ON_PATH = Path(__file__).parent.name
@@ -31,6 +93,92 @@ class deframe_nodes():
         for node, parent in self.parent_dict.items():
             node.parent = parent
 
+def combine_selection(selection_mode, selected_nodes, target_nodes):
+    if selection_mode == 'New':
+        return set(target_nodes)
+    elif selection_mode == 'Add':
+        return selected_nodes.union(target_nodes)
+    elif selection_mode == 'Subtract':
+        return selected_nodes.difference(target_nodes)
+    elif selection_mode == 'Intersection':
+        return selected_nodes.intersection(target_nodes)
+    elif selection_mode == 'Invert':
+        return selected_nodes.symmetric_difference(target_nodes)
+    return None
+
+def get_ui_scale():
+    return bpy.context.preferences.system.ui_scale
+
+class FrameIndex():
+    # Maps every frame to its children and computes the bounds of their contents bottom-up.
+    # Bounds are (left, top, right, bottom) in absolute view coordinates.
+    def __init__(self, nodes):
+        self.frames = {}
+        self.children = {}
+        self.offsets = {}
+        self.bounds = {}
+
+        for node in nodes:
+            if node.bl_static_type == 'FRAME':
+                self.frames[node.name] = node
+                self.children.setdefault(node.name, [])
+            if node.parent is not None:
+                self.children.setdefault(node.parent.name, []).append(node)
+
+        depths = {}
+        for name, frame in self.frames.items():
+            self.parent_offset(frame)
+            depths[name] = self.depth(frame, depths)
+
+        scale = get_ui_scale()
+        for name in sorted(self.frames, key=depths.get, reverse=True):
+            child_bounds = []
+            for child in self.children[name]:
+                if child.bl_static_type == 'FRAME':
+                    if self.bounds.get(child.name) is not None:
+                        child_bounds.append(self.bounds[child.name])
+                else:
+                    child_bounds.append(self.node_bounds(child, scale))
+
+            if child_bounds:
+                self.bounds[name] = (
+                    min(b[0] for b in child_bounds), max(b[1] for b in child_bounds),
+                    max(b[2] for b in child_bounds), min(b[3] for b in child_bounds))
+            else:
+                self.bounds[name] = None
+
+    def depth(self, frame, depths):
+        if frame.name not in depths:
+            depths[frame.name] = 0 if frame.parent is None else self.depth(frame.parent, depths) + 1
+        return depths[frame.name]
+
+    def parent_offset(self, node):
+        parent = node.parent
+        if parent is None:
+            return (0.0, 0.0)
+        if hasattr(node, "location_absolute"):
+            return (node.location_absolute.x - node.location.x, node.location_absolute.y - node.location.y)
+        offset = self.offsets.get(parent.name)
+        if offset is None:
+            parent_offset = self.parent_offset(parent)
+            offset = (parent_offset[0] + parent.location.x, parent_offset[1] + parent.location.y)
+            self.offsets[parent.name] = offset
+        return offset
+
+    def node_bounds(self, node, scale):
+        offset_x, offset_y = self.parent_offset(node)
+        left = node.location.x + offset_x
+        top = node.location.y + offset_y
+        return (left, top, left + node.dimensions.x / scale, top - node.dimensions.y / scale)
+
+    def descendants(self, frame_name):
+        stack = list(self.children.get(frame_name, ()))
+        while stack:
+            node = stack.pop()
+            yield node
+            if node.bl_static_type == 'FRAME':
+                stack.extend(self.children.get(node.name, ()))
+
 class NodeUtilsBase:
     bl_label = "Nodeutils Baseclass"
     bl_options = {'REGISTER', 'UNDO'} 
@@ -74,17 +222,8 @@ class NODEUTILS_OT_SELECT_BY_TYPE(bpy.types.Operator, NodeUtilsBase):
         
         nodes_of_spec_type = set(node for node in nodes if check_condition(node.bl_static_type))
         
-        if selection_mode == 'New':
-            nodes_to_select = nodes_of_spec_type
-        elif selection_mode == 'Add':
-            nodes_to_select = selected_nodes.union(nodes_of_spec_type)
-        elif selection_mode == 'Subtract':
-            nodes_to_select = selected_nodes.difference(nodes_of_spec_type)
-        elif selection_mode == 'Intersection':
-            nodes_to_select = selected_nodes.intersection(nodes_of_spec_type)
-        elif selection_mode == 'Invert':
-            nodes_to_select = selected_nodes.symmetric_difference(nodes_of_spec_type)
-        else:
+        nodes_to_select = combine_selection(selection_mode, selected_nodes, nodes_of_spec_type)
+        if nodes_to_select is None:
             return {'CANCELLED'}
 
         if prefs.ignore_empty_selections:
@@ -95,10 +234,12 @@ class NODEUTILS_OT_SELECT_BY_TYPE(bpy.types.Operator, NodeUtilsBase):
         if will_selection_be_identical:
             return {'CANCELLED'}
 
+        record_selection(nodes.id_data)
         for node in nodes:
             node.select = False
         for node in nodes_to_select:
             node.select = True
+        record_selection(nodes.id_data)
 
         return {'FINISHED'}
 
@@ -195,6 +336,18 @@ class NODEUTILS_OT_SET_WIDTH(bpy.types.Operator, NodeUtilsBase):
     def invoke(self, context, event):
         return context.window_manager.invoke_props_popup(self, event)
 
+default_node_color = (0.608, 0.608, 0.608)
+
+def set_node_color(nodes, color):
+    if color is None:
+        for node in nodes:
+            node.use_custom_color = False
+            node.color = default_node_color
+    else:
+        for node in nodes:
+            node.use_custom_color = True
+            node.color = color
+
 #Somewhat inspired by: https://github.com/valcohen/tidy_group_inputs
 class NODEUTILS_OT_SET_COLOR(bpy.types.Operator, NodeUtilsBase):
     bl_label = "Set Node Color"
@@ -218,13 +371,9 @@ class NODEUTILS_OT_SET_COLOR(bpy.types.Operator, NodeUtilsBase):
         will_colors_be_identical = all(node.color == custom_color for node in selected_nodes)
 
         if self.color_opmode == 'SET_COLOR':
-            for node in selected_nodes:
-                node.use_custom_color = True
-                node.color = custom_color
+            set_node_color(selected_nodes, custom_color)
         elif self.color_opmode == 'CLEAR_COLOR':
-            for node in selected_nodes:
-                node.use_custom_color = False
-                node.color = (0.608, 0.608, 0.608)
+            set_node_color(selected_nodes, None)
         
         new_status = tuple(node.use_custom_color for node in selected_nodes)
         if (old_status == new_status) and will_colors_be_identical:
@@ -379,6 +528,174 @@ class NODEUTILS_OT_TOGGLE_UNUSED_SOCKETS(bpy.types.Operator, NodeUtilsBase):
             socket.hide = toggle_value
         return {'FINISHED'}
 
+performance_store_key = "nd_utils_performance"
+
+def iter_nested_trees(tree):
+    # Each group datablock is only visited once, however many times it is instanced
+    visited = set()
+    stack = [tree]
+    while stack:
+        tree = stack.pop()
+        if tree.as_pointer() in visited:
+            continue
+        visited.add(tree.as_pointer())
+        yield tree
+        for node in tree.nodes:
+            group_tree = getattr(node, "node_tree", None) if node.bl_static_type == 'GROUP' else None
+            if group_tree is not None:
+                stack.append(group_tree)
+
+def node_flags(nodes, prop_name):
+    flags = np.zeros(len(nodes), dtype=bool)
+    nodes.foreach_get(prop_name, flags)
+    return flags
+
+def node_samples(node):
+    # Sample count of nodes like Bevel and Ambient Occlusion, either a setting or an unlinked input
+    samples = getattr(node, "samples", None)
+    if samples is None:
+        socket = node.inputs.get("Samples")
+        if socket is not None and not socket.is_linked and hasattr(socket, "default_value"):
+            samples = socket.default_value
+    return samples
+
+def is_heavy_node(node, heavy_types, min_samples):
+    if node.bl_idname not in heavy_types:
+        return False
+    samples = node_samples(node)
+    return samples is None or samples >= min_samples
+
+def plan_performance_mode(tree, heavy_types, min_samples):
+    # Per tree, the indices of nodes whose preview would be hidden and of heavy nodes that would be muted
+    plan = []
+    for nested_tree in iter_nested_trees(tree):
+        if nested_tree.library is not None:
+            continue
+        nodes = nested_tree.nodes
+        heavy = np.fromiter((is_heavy_node(node, heavy_types, min_samples) for node in nodes), dtype=bool, count=len(nodes))
+        previews = np.flatnonzero(node_flags(nodes, "show_preview"))
+        mutes = np.flatnonzero(heavy & ~node_flags(nodes, "mute"))
+        if len(previews) or len(mutes):
+            plan.append((nested_tree, previews, mutes))
+    return plan
+
+def apply_performance_mode(plan):
+    for tree, previews, mutes in plan:
+        nodes = tree.nodes
+        stored = tree.get(performance_store_key)
+        store = stored.to_dict() if stored is not None else {"names": [], "hid_preview": [], "muted": []}
+
+        # Only what the mode changed is recorded, nodes it already changed before add to their record
+        recorded = {name: k for k, name in enumerate(store["names"])}
+        hid_previews = set(previews.tolist())
+        muted = set(mutes.tolist())
+        for i in sorted(hid_previews | muted):
+            name = nodes[i].name
+            k = recorded.get(name)
+            if k is None:
+                store["names"].append(name)
+                store["hid_preview"].append(int(i in hid_previews))
+                store["muted"].append(int(i in muted))
+            else:
+                store["hid_preview"][k] |= int(i in hid_previews)
+                store["muted"][k] |= int(i in muted)
+
+        preview = node_flags(nodes, "show_preview")
+        mute = node_flags(nodes, "mute")
+
+        preview[previews] = False
+        mute[mutes] = True
+        nodes.foreach_set("show_preview", preview)
+        nodes.foreach_set("mute", mute)
+        tree[performance_store_key] = store
+
+def restore_performance_mode(tree):
+    restored = 0
+    for nested_tree in iter_nested_trees(tree):
+        stored = nested_tree.get(performance_store_key)
+        if stored is None:
+            continue
+        store = stored.to_dict()
+        nodes = nested_tree.nodes
+        index = {node.name: i for i, node in enumerate(nodes)}
+        preview = node_flags(nodes, "show_preview")
+        mute = node_flags(nodes, "mute")
+        # Nodes the user changed again since keep their current state
+        for name, hid_preview, muted in zip(store["names"], store["hid_preview"], store["muted"]):
+            i = index.get(name)
+            if i is None:
+                continue
+            changed = False
+            if hid_preview and not preview[i]:
+                preview[i] = changed = True
+            if muted and mute[i]:
+                mute[i] = False
+                changed = True
+            restored += changed
+        nodes.foreach_set("show_preview", preview)
+        nodes.foreach_set("mute", mute)
+        del nested_tree[performance_store_key]
+    return restored
+
+
+class NODEUTILS_OT_ENABLE_PERFORMANCE_MODE(bpy.types.Operator, NodeUtilsBase):
+    bl_label = "Enable Performance Mode"
+    bl_idname = "nd_utils.enable_performance_mode"
+    bl_description = "Hides node previews and mutes heavy node types in the current tree and its nested groups"
+
+    max_listed = 20
+
+    def plan(self, context):
+        prefs = fetch_user_preferences()
+        heavy_types = set(name.strip() for name in prefs.heavy_node_types.split(",") if name.strip())
+        return plan_performance_mode(get_tree(context), heavy_types, prefs.heavy_sample_threshold)
+
+    def draw(self, context):
+        layout = self.layout
+        plan = getattr(self, "planned", ())
+        preview_count = sum(len(previews) for _, previews, _ in plan)
+        muted = [(tree, tree.nodes[int(i)]) for tree, _, mutes in plan for i in mutes]
+
+        layout.label(text=f"Hide {preview_count} previews, mute {len(muted)} nodes:")
+        col = layout.box().column(align=True)
+        for tree, node in muted[:self.max_listed]:
+            col.label(text=f"{tree.name} / {node.name}", icon='MUTE_IPO_ON')
+        if len(muted) > self.max_listed:
+            col.label(text=f"... and {len(muted) - self.max_listed} more")
+        if not muted:
+            col.label(text="No heavy nodes found", icon='INFO')
+
+    def execute(self, context):
+        plan = self.plan(context)
+        if not plan:
+            return {'CANCELLED'}
+
+        apply_performance_mode(plan)
+        preview_count = sum(len(previews) for _, previews, _ in plan)
+        mute_count = sum(len(mutes) for _, _, mutes in plan)
+        self.report({'INFO'}, f"Hid {preview_count} previews and muted {mute_count} nodes in {len(plan)} trees")
+        return {'FINISHED'}
+
+    def invoke(self, context, event):
+        self.planned = self.plan(context)
+        if not self.planned:
+            return {'CANCELLED'}
+        return context.window_manager.invoke_props_dialog(self)
+
+
+class NODEUTILS_OT_RESTORE_PERFORMANCE_MODE(bpy.types.Operator, NodeUtilsBase):
+    bl_label = "Restore Performance Mode"
+    bl_idname = "nd_utils.restore_performance_mode"
+    bl_description = "Restores the previews and mute states changed by performance mode"
+
+    def execute(self, context):
+        restored = restore_performance_mode(get_tree(context))
+        if restored == 0:
+            return {'CANCELLED'}
+
+        self.report({'INFO'}, f"Restored {restored} nodes")
+        return {'FINISHED'}
+
 class NODEUTILS_OT_SWITCH_SELECT_TYPE(bpy.types.Operator, NodeUtilsBase):
     bl_label = "Switch Select Type"
     bl_idname = "nd_utils.switch_select_type"
@@ -420,6 +737,47 @@ class NODEUTILS_OT_SWITCH_SELECT_TYPE(bpy.types.Operator, NodeUtilsBase):
         selection_enum.selection_mode = new_select_mode
         return {'FINISHED'}
 
+pending_viewer_domains = {}
+viewer_commit_state = {"last_change": 0.0, "area": None}
+
+def commit_viewer_domains():
+    delay = fetch_user_preferences().coalesce_delay
+    elapsed = time.perf_counter() - viewer_commit_state["last_change"]
+    if elapsed < delay:
+        return delay - elapsed
+
+    changed = False
+    for (tree_key, name), domain in pending_viewer_domains.items():
+        tree = resolve_tree_owner(tree_key)
+        node = tree.nodes.get(name) if tree is not None else None
+        if node is not None and node.domain != domain:
+            node.domain = domain
+            changed = True
+    pending_viewer_domains.clear()
+
+    area = viewer_commit_state["area"]
+    viewer_commit_state["area"] = None
+    try:
+        area.header_text_set(None)
+    except (AttributeError, ReferenceError):
+        pass
+
+    if changed:
+        try:
+            bpy.ops.ed.undo_push(message="Switch Viewer Domain")
+        except RuntimeError:
+            pass
+    return None
+
+@persistent
+def viewer_domain_load_handler(dummy):
+    # Pending domains belong to the trees of the file being closed
+    if bpy.app.timers.is_registered(commit_viewer_domains):
+        bpy.app.timers.unregister(commit_viewer_domains)
+    pending_viewer_domains.clear()
+    viewer_commit_state["last_change"] = 0.0
+    viewer_commit_state["area"] = None
+
 class NODEUTILS_OT_SWITCH_VIEWER_DOMAIN(bpy.types.Operator, NodeUtilsBase):
     bl_label = "Switch Viewer Domain"
     bl_idname = "nd_utils.switch_viewer_domain"
@@ -456,14 +814,18 @@ class NODEUTILS_OT_SWITCH_VIEWER_DOMAIN(bpy.types.Operator, NodeUtilsBase):
     def execute(self, context):
         nodes = get_nodes(context)
         active_node = context.active_node
+        tree_key = tree_owner_key(nodes.id_data)
+        delay = fetch_user_preferences().coalesce_delay
 
         domains = self.determine_source_geo(active_node)
+        new_domains = {}
 
         for node in nodes:
             if node.bl_static_type != "VIEWER":
                 continue
 
-            current_id = domains.index(node.domain)
+            current_domain = pending_viewer_domains.get((tree_key, node.name), node.domain)
+            current_id = domains.index(current_domain)
 
             if not self.switch_mode.startswith('CYCLE'):
                 if self.switch_mode == 'SWITCH_TO_FIRST':
@@ -476,8 +838,22 @@ class NODEUTILS_OT_SWITCH_VIEWER_DOMAIN(bpy.types.Operator, NodeUtilsBase):
             elif self.switch_mode == "CYCLE_DOWN":
                 new_id = min(current_id + 1, len(domains) - 1)
             
-            node.domain = domains[new_id]
-                
+            new_domains[node.name] = domains[new_id]
+
+        if tree_key is None or delay <= 0:
+            for name, domain in new_domains.items():
+                nodes[name].domain = domain
+            return {'FINISHED'}
+
+        # Every domain change re-evaluates the viewed geometry, so repeated presses only update
+        # the pending domain and the change is committed once input settles
+        for name, domain in new_domains.items():
+            pending_viewer_domains[(tree_key, name)] = domain
+        viewer_commit_state["last_change"] = time.perf_counter()
+        viewer_commit_state["area"] = context.area
+        context.area.header_text_set(f"Viewer Domain: {', '.join(sorted(set(new_domains.values())))}")
+        if not bpy.app.timers.is_registered(commit_viewer_domains):
+            bpy.app.timers.register(commit_viewer_domains, first_interval=delay)
         return {'FINISHED'}
 
 class NODEUTILS_OT_PIE_MENU_SWITCH_VIEWER_DOMAIN(bpy.types.Operator, NodeUtilsBase):
@@ -679,51 +1055,3342 @@ class NODEUTILS_OT_STRAIGHTEN_REROUTES(bpy.types.Operator, NodeUtilsBase):
         return {'FINISHED'}
 
 
-def refresh_ui(self, context):
-    for region in context.area.regions:
-        if region.type == "UI":
-            region.tag_redraw()
-    return None    
+class NODEUTILS_OT_COLLAPSE_REROUTES(bpy.types.Operator, NodeUtilsBase):
+    bl_label = "Collapse Reroutes"
+    bl_idname = "nd_utils.collapse_reroutes"
+    bl_description = "Removes pass-through reroutes and links their endpoints directly"
 
-class NodetreeUtilsProperties(bpy.types.PropertyGroup):
-    selection_mode: EnumProperty(name='Selection Mode', 
-        description='Toggles what mode of selection is used.',
-        default='New',
-        update=refresh_ui, 
-        items=(
-        ('New', 'New', 'Creates a new selection out of the specified nodes', 'SELECT_SET', 0),
-        ('Add', 'Add', 'Adds specified nodes from current selection', 'SELECT_EXTEND', 1), 
-        ('Subtract', 'Subtract', 'Removes specified nodes from current selection', 'SELECT_SUBTRACT', 2), 
-        ('Intersection', 'Intersection', 'Only selects nodes shared between specified nodes and current selection','SELECT_INTERSECT', 3),
-        ('Invert', 'Invert', 'Flip the selection state of the specified nodes','SELECT_DIFFERENCE', 4),
-        ))
+    selected_only: BoolProperty(name="Selected Only", default=False,
+        description="Only collapse selected reroutes")
+    keep_labeled: BoolProperty(name="Keep Labeled", default=True,
+        description="Keep reroutes that have a label")
+    collinear_only: BoolProperty(name="Collinear Only", default=False,
+        description="Only collapse reroutes that lie on the straight line between their neighbors")
+    tolerance: FloatProperty(name="Tolerance", default=5.0, min=0.0,
+        description="Maximum distance from the line between neighbors for a reroute to count as collinear")
 
-classes = (
-    NodetreeUtilsProperties,
-    NODEUTILS_OT_SELECT_BY_TYPE,
-    NODEUTILS_OT_NORMALIZE_NODE_WIDTH,
-    NODEUTILS_OT_BATCH_LABEL,
-    NODEUTILS_OT_SET_WIDTH,
-    NODEUTILS_OT_SET_COLOR,
-    NODEUTILS_OT_LABEL_REROUTES,
-    NODEUTILS_OT_RECENTER_NODES,
-    NODEUTILS_OT_TOGGLE_UNUSED_SOCKETS,
-    NODEUTILS_OT_SWITCH_SELECT_TYPE,
-    NODEUTILS_OT_SWITCH_VIEWER_DOMAIN,
-    NODEUTILS_OT_PIE_MENU_SWITCH_VIEWER_DOMAIN,
-    NODEUTILS_MT_SWITCH_VIEWER_DOMAIN_OPTIONS,
-    NODEUTILS_OT_SWITCH_VIEWER_DOMAIN_INVOKE_MENU,
-    NODEUTILS_OT_STRAIGHTEN_REROUTES,
-)
+    @staticmethod
+    def is_collinear(start, point, end, tolerance):
+        # Distance to the segment between the neighbors, a reroute beyond either end is never straight
+        dx, dy = end[0] - start[0], end[1] - start[1]
+        length_squared = dx*dx + dy*dy
+        t = 0.0 if length_squared == 0 else ((point[0] - start[0])*dx + (point[1] - start[1])*dy) / length_squared
+        t = min(max(t, 0.0), 1.0)
+        offset_x, offset_y = point[0] - (start[0] + t*dx), point[1] - (start[1] + t*dy)
+        return (offset_x*offset_x + offset_y*offset_y) ** 0.5 <= tolerance
 
-def register():
-    for cls in classes:
-        bpy.utils.register_class(cls)
-    
-    bpy.types.WindowManager.nd_utils_props = bpy.props.PointerProperty(type=NodetreeUtilsProperties)
+    def execute(self, context):
+        tree = get_tree(context)
+        nodes = tree.nodes
 
-def unregister():
-    for cls in classes:
-        bpy.utils.unregister_class(cls)
+        # socket.links scans every link in the tree on each access, so gather them all in one pass instead
+        incoming = {}
+        outgoing = {}
+        for link in tree.links:
+            if link.to_node.bl_static_type == 'REROUTE':
+                incoming.setdefault(link.to_node.name, []).append(link)
+            if link.from_node.bl_static_type == 'REROUTE':
+                outgoing.setdefault(link.from_node.name, []).append(link)
+
+        # Locations are relative to the parent frame, so neighbors in other frames are compared in view space
+        frame_index = FrameIndex(nodes) if self.collinear_only else None
+        def absolute_location(node):
+            offset_x, offset_y = frame_index.parent_offset(node)
+            return (node.location.x + offset_x, node.location.y + offset_y)
+
+        removable = set()
+        for node in nodes:
+            if node.bl_static_type != 'REROUTE' or (self.selected_only and not node.select):
+                continue
+            in_links = incoming.get(node.name, ())
+            out_links = outgoing.get(node.name, ())
+            if len(in_links) != 1 or not out_links:
+                continue
+            if self.keep_labeled and node.label != '':
+                continue
+            if self.collinear_only:
+                start = absolute_location(in_links[0].from_node)
+                point = absolute_location(node)
+                if not all(self.is_collinear(start, point, absolute_location(link.to_node), self.tolerance) for link in out_links):
+                    continue
+            removable.add(node.name)
+
+        if not removable:
+            return {'CANCELLED'}
+
+        # Maps each reroute to the socket its chain starts from, and whether any link on the way was muted
+        sources = {}
+        muted_chains = {}
+        for name in removable:
+            chain = []
+            current = name
+            source = None
+            chain_muted = []
+            muted = False
+            while True:
+                if current in sources:
+                    source = sources[current]
+                    muted = muted_chains[current]
+                    break
+                if current in chain:
+                    break
+                chain.append(current)
+                link = incoming[current][0]
+                chain_muted.append(link.is_muted)
+                if link.from_node.name not in removable:
+                    source = link.from_socket
+                    break
+                current = link.from_node.name
+
+            for reroute_name, is_muted in zip(reversed(chain), reversed(chain_muted)):
+                muted = muted or is_muted
+                sources[reroute_name] = source
+                muted_chains[reroute_name] = muted
+
+        new_links = []
+        multi_inputs = {}
+        for name in removable:
+            source = sources[name]
+            if source is None:
+                continue
+            for link in outgoing[name]:
+                if link.to_node.name in removable:
+                    continue
+                if link.to_socket.is_multi_input:
+                    multi_inputs[link.to_socket.as_pointer()] = link.to_socket
+                else:
+                    new_links.append((source, link.to_socket, link.is_muted or muted_chains[name]))
+
+        old_node_count = len(nodes)
+        old_link_count = len(tree.links)
+
+        # New links always go to the end of a multi-input socket, so all of its links are
+        # recreated in their original order with the reroutes replaced by their sources
+        for to_socket in multi_inputs.values():
+            for link in sorted(to_socket.links, key=lambda link: link.multi_input_sort_id):
+                if link.from_node.name in removable:
+                    if sources[link.from_node.name] is not None:
+                        new_links.append((sources[link.from_node.name], to_socket, link.is_muted or muted_chains[link.from_node.name]))
+                else:
+                    new_links.append((link.from_socket, to_socket, link.is_muted))
+                    tree.links.remove(link)
+
+        for name in removable:
+            nodes.remove(nodes[name])
+        for from_socket, to_socket, is_muted in new_links:
+            tree.links.new(from_socket, to_socket).is_muted = is_muted
+
+        removed_nodes = old_node_count - len(nodes)
+        removed_links = old_link_count - len(tree.links)
+        self.report({'INFO'}, f"Collapsed {removed_nodes} reroutes, eliminating {removed_links} links")
+        return {'FINISHED'}
+
+
+unmergeable_types = ('FRAME', 'REROUTE', 'GROUP_INPUT', 'GROUP_OUTPUT', 'VIEWER')
+zone_idnames = ('SimulationInput', 'SimulationOutput', 'RepeatInput', 'RepeatOutput',
+    'ForeachGeometryElementInput', 'ForeachGeometryElementOutput')
+node_property_cache = {}
+
+def node_property_ids(node):
+    property_ids = node_property_cache.get(node.bl_idname)
+    if property_ids is None:
+        base_ids = set(prop.identifier for prop in bpy.types.Node.bl_rna.properties)
+        property_ids = tuple(prop.identifier for prop in node.bl_rna.properties
+            if prop.identifier not in base_ids and not prop.is_hidden)
+        node_property_cache[node.bl_idname] = property_ids
+    return property_ids
+
+def rna_value_key(value, depth=0, library_relative=False):
+    # Library relative keys leave out which library an ID comes from, so a linked tree compares
+    # equal to its local copy. Within one file the full name is needed to tell the IDs apart.
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, (set, frozenset)):
+        return tuple(sorted(value))
+    if isinstance(value, bpy.types.ID):
+        if library_relative:
+            return ('ID', value.bl_rna.identifier, value.name)
+        return ('ID', value.name_full)
+    if isinstance(value, bpy.types.Node):
+        return ('NODE', value.name)
+    if isinstance(value, bpy.types.NodeSocket):
+        return ('SOCKET', value.identifier)
+    if isinstance(value, bpy.types.bpy_struct):
+        if depth >= 4:
+            return ('STRUCT', value.as_pointer())
+        return tuple((prop.identifier, rna_value_key(getattr(value, prop.identifier, None), depth + 1, library_relative))
+            for prop in value.bl_rna.properties if prop.identifier != 'rna_type')
+    try:
+        return tuple(rna_value_key(item, depth + 1, library_relative) for item in value)
+    except TypeError:
+        return repr(value)
+
+def socket_value_key(socket, library_relative=False):
+    if not hasattr(socket, "default_value"):
+        return None
+    return rna_value_key(socket.default_value, library_relative=library_relative)
+
+def is_mergeable(node):
+    if node.bl_static_type in unmergeable_types or len(node.outputs) == 0:
+        return False
+    return not any(name in node.bl_idname for name in zone_idnames)
+
+def structural_hashes(tree, library_relative=False):
+    # Hashes each node from its type, settings, unlinked input values and the hashes of whatever feeds it.
+    # Reroutes are transparent, so a chain of them hashes the same as a direct link to its source.
+    upstream = {}
+    for link in tree.links:
+        if not link.is_valid or getattr(link, "is_muted", False):
+            continue
+        upstream.setdefault(link.to_node.name, []).append(link)
+
+    nodes = tree.nodes
+    keys = {}
+    visiting = set()
+
+    def link_key(link):
+        from_key = keys[link.from_node.name]
+        if link.from_node.bl_static_type == 'REROUTE':
+            return ('R', from_key)
+        return ('S', from_key, link.from_socket.identifier)
+
+    def compute_key(node):
+        links = upstream.get(node.name, ())
+        if node.bl_static_type == 'REROUTE':
+            return link_key(links[0]) if links else None
+
+        socket_links = {}
+        for link in links:
+            socket_links.setdefault(link.to_socket.identifier, []).append(link)
+
+        inputs = []
+        for socket in node.inputs:
+            linked = socket_links.get(socket.identifier)
+            if linked:
+                linked.sort(key=lambda link: getattr(link, "multi_input_sort_id", 0))
+                inputs.append((socket.identifier, tuple(link_key(link) for link in linked)))
+            else:
+                inputs.append((socket.identifier, socket.enabled, socket_value_key(socket, library_relative)))
+
+        settings = tuple((prop_id, rna_value_key(getattr(node, prop_id, None), library_relative=library_relative)) for prop_id in node_property_ids(node))
+        outputs = tuple(socket.identifier for socket in node.outputs)
+        key = (node.bl_idname, node.mute, settings, tuple(inputs), outputs)
+        return hashlib.blake2b(repr(key).encode(), digest_size=16).hexdigest()
+
+    for root in nodes:
+        if root.name in keys:
+            continue
+        stack = [root]
+        while stack:
+            node = stack[-1]
+            if node.name in keys:
+                stack.pop()
+                continue
+            missing = [link.from_node for link in upstream.get(node.name, ()) if link.from_node.name not in keys]
+            if missing and node.name not in visiting:
+                visiting.add(node.name)
+                stack.extend(n for n in missing if n.name not in visiting)
+                continue
+            if missing:
+                # Only happens with an invalid cycle, treat the node as unique
+                keys[node.name] = ('CYCLE', node.name)
+            else:
+                keys[node.name] = compute_key(node)
+            visiting.discard(node.name)
+            stack.pop()
+    return keys
+
+
+class NODEUTILS_OT_MERGE_DUPLICATE_NODES(bpy.types.Operator, NodeUtilsBase):
+    bl_label = "Merge Duplicate Nodes"
+    bl_idname = "nd_utils.merge_duplicate_nodes"
+    bl_description = "Merges nodes that compute the same value from the same inputs and settings"
+
+    selected_only: BoolProperty(name="Selected Only", default=False,
+        description="Only merge duplicates among selected nodes")
+    dry_run: BoolProperty(name="Dry Run", default=False,
+        description="Only report how many nodes would be merged without changing the tree")
+
+    def execute(self, context):
+        tree = get_tree(context)
+        nodes = tree.nodes
+        hashes = structural_hashes(tree)
+
+        groups = {}
+        for node in nodes:
+            if not is_mergeable(node) or (self.selected_only and not node.select):
+                continue
+            groups.setdefault(hashes[node.name], []).append(node)
+
+        duplicate_groups = tuple(group for group in groups.values() if len(group) > 1)
+        duplicate_count = sum(len(group) - 1 for group in duplicate_groups)
+        if duplicate_count == 0:
+            self.report({'INFO'}, "No duplicate nodes found")
+            return {'CANCELLED'}
+
+        if self.dry_run:
+            self.report({'INFO'}, f"{duplicate_count} duplicates in {len(duplicate_groups)} groups, "
+                f"node count would go from {len(nodes)} to {len(nodes) - duplicate_count}")
+            return {'CANCELLED'}
+
+        keeper_of = {}
+        for group in duplicate_groups:
+            keeper = min(group, key=lambda n: (n.location.x, -n.location.y))
+            for node in group:
+                if node != keeper:
+                    keeper_of[node.name] = keeper.name
+
+        relinks = []
+        multi_inputs = {}
+        for link in tree.links:
+            keeper_name = keeper_of.get(link.from_node.name)
+            if keeper_name is None or link.to_node.name in keeper_of:
+                continue
+            if link.to_socket.is_multi_input:
+                multi_inputs[link.to_socket.as_pointer()] = link.to_socket
+            else:
+                relinks.append((keeper_name, link.from_socket.identifier, link.to_node.name, link.to_socket.identifier, link.is_muted))
+
+        # New links always go to the end of a multi-input socket, so all of its links are
+        # recreated in their original order with the duplicates replaced by their keepers
+        for to_socket in multi_inputs.values():
+            for link in sorted(to_socket.links, key=lambda link: link.multi_input_sort_id):
+                from_name = link.from_node.name
+                relinks.append((keeper_of.get(from_name, from_name), link.from_socket.identifier, link.to_node.name, to_socket.identifier, link.is_muted))
+                if from_name not in keeper_of:
+                    tree.links.remove(link)
+
+        for name in keeper_of:
+            nodes.remove(nodes[name])
+
+        for keeper_name, from_id, to_name, to_id, is_muted in relinks:
+            from_socket = next(socket for socket in nodes[keeper_name].outputs if socket.identifier == from_id)
+            to_socket = next(socket for socket in nodes[to_name].inputs if socket.identifier == to_id)
+            tree.links.new(from_socket, to_socket).is_muted = is_muted
+
+        self.report({'INFO'}, f"Merged {duplicate_count} duplicate nodes")
+        return {'FINISHED'}
+
+
+def canonical_nodes(tree):
+    # Name-independent description of every node: its structural hash for matching renamed nodes,
+    # and its own settings and unlinked input values for detecting modifications
+    # IDs are compared without their library, so a linked tree diffs cleanly against its local copy
+    hashes = structural_hashes(tree, library_relative=True)
+    canonical = {}
+    for node in tree.nodes:
+        canonical[node.name] = {
+            "idname": node.bl_idname,
+            "hash": hashes[node.name],
+            "settings": (node.mute,) + tuple(rna_value_key(getattr(node, prop_id, None), library_relative=True) for prop_id in node_property_ids(node)),
+            "defaults": {socket.identifier: socket_value_key(socket, True) for socket in node.inputs if not socket.is_linked},
+        }
+    return canonical
+
+def canonical_links(tree):
+    return set((link.from_node.name, link.from_socket.identifier, link.to_node.name, link.to_socket.identifier)
+        for link in tree.links)
+
+def diff_trees(old_tree, new_tree):
+    old_nodes = canonical_nodes(old_tree)
+    new_nodes = canonical_nodes(new_tree)
+
+    # Nodes are matched by name first, then whatever is left by structural hash
+    matches = {name: name for name, node in old_nodes.items()
+        if name in new_nodes and new_nodes[name]["idname"] == node["idname"]}
+    unmatched_new = {}
+    for name in sorted(new_nodes.keys() - matches.values()):
+        unmatched_new.setdefault(new_nodes[name]["hash"], []).append(name)
+    renamed = []
+    for name in sorted(old_nodes.keys() - matches.keys()):
+        candidates = unmatched_new.get(old_nodes[name]["hash"])
+        if candidates:
+            matches[name] = candidates.pop(0)
+            renamed.append((name, matches[name]))
+
+    modified = []
+    defaults = []
+    for old_name, new_name in matches.items():
+        old_node, new_node = old_nodes[old_name], new_nodes[new_name]
+        changed_defaults = [(new_name, identifier, value, new_node["defaults"][identifier])
+            for identifier, value in old_node["defaults"].items()
+            if identifier in new_node["defaults"] and new_node["defaults"][identifier] != value]
+        if changed_defaults or old_node["settings"] != new_node["settings"]:
+            modified.append(new_name)
+        defaults.extend(changed_defaults)
+
+    # Links of removed nodes keep the old node name, marked so they can never equal a link in the new tree
+    old_links = set((matches.get(from_name, f"{from_name} (removed)"), from_id, matches.get(to_name, f"{to_name} (removed)"), to_id)
+        for from_name, from_id, to_name, to_id in canonical_links(old_tree))
+    new_links = canonical_links(new_tree)
+    matched_new = set(matches.values())
+
+    return {
+        "added_nodes": sorted(new_nodes.keys() - matched_new),
+        "removed_nodes": sorted(old_nodes.keys() - matches.keys()),
+        "renamed_nodes": renamed,
+        "modified_nodes": sorted(modified),
+        "changed_defaults": defaults,
+        "added_links": sorted(new_links - old_links),
+        "removed_links": sorted(old_links - new_links),
+    }
+
+diff_results = {}
+diff_tree_items = []
+diff_added_color = (0.2, 0.5, 0.25)
+diff_modified_color = (0.65, 0.5, 0.15)
+
+diff_listed_count = 30
+
+def draw_diff_results(menu, context):
+    lines = [(f"Added {name}", 'ADD') for name in diff_results["added_nodes"]]
+    lines += [(f"Removed {name}", 'REMOVE') for name in diff_results["removed_nodes"]]
+    lines += [(f"Renamed {old} to {new}", 'SORTALPHA') for old, new in diff_results["renamed_nodes"]]
+    lines += [(f"Modified {name}", 'MODIFIER') for name in diff_results["modified_nodes"]]
+    lines += [(f"Linked {link[0]}:{link[1]} to {link[2]}:{link[3]}", 'LINKED') for link in diff_results["added_links"]]
+    lines += [(f"Unlinked {link[0]}:{link[1]} from {link[2]}:{link[3]}", 'UNLINKED') for link in diff_results["removed_links"]]
+    for text, icon in lines[:diff_listed_count]:
+        menu.layout.label(text=text, icon=icon)
+    if len(lines) > diff_listed_count:
+        menu.layout.label(text=f"... and {len(lines) - diff_listed_count} more")
+
+def iter_comparable_trees(tree_type):
+    # Unlike iter_data_trees this includes trees linked from other files through bpy.data.libraries
+    for collection, _ in tree_owner_collections:
+        for data_id in getattr(bpy.data, collection):
+            tree = data_id if collection == 'node_groups' else getattr(data_id, "node_tree", None)
+            if tree is not None and tree.bl_idname == tree_type:
+                yield collection, data_id, tree
+
+def comparable_tree_items(self, context):
+    diff_tree_items.clear()
+    current = get_tree(context)
+    for collection, data_id, tree in iter_comparable_trees(current.bl_idname):
+        if tree == current:
+            continue
+        description = f"Linked from {data_id.library.filepath}" if data_id.library else ""
+        icon = 'LINKED' if data_id.library else 'NODETREE'
+        diff_tree_items.append((f"{collection}:{data_id.name_full}", data_id.name_full, description, icon, len(diff_tree_items)))
+    if not diff_tree_items:
+        diff_tree_items.append(('NONE', "No Other Trees", "", 'INFO', 0))
+    return diff_tree_items
+
+
+class NODEUTILS_OT_DIFF_TREES(bpy.types.Operator, NodeUtilsBase):
+    bl_label = "Compare Trees"
+    bl_idname = "nd_utils.diff_trees"
+    bl_description = "Lists the nodes, links and input values that differ between another tree and the current one"
+    bl_property = "other_tree"
+
+    other_tree: EnumProperty(name="Compare With", items=comparable_tree_items)
+    highlight: BoolProperty(name="Highlight", default=False,
+        description="Color added and modified nodes and select every node that changed")
+
+    def execute(self, context):
+        if self.other_tree == 'NONE':
+            return {'CANCELLED'}
+        tree = get_tree(context)
+        collection, name = self.other_tree.split(":", 1)
+        other = next((other for other_collection, data_id, other in iter_comparable_trees(tree.bl_idname)
+            if other_collection == collection and data_id.name_full == name), None)
+        if other is None:
+            return {'CANCELLED'}
+
+        diff_results.clear()
+        diff_results.update(diff_trees(other, tree))
+        change_count = sum(len(diff_results[key]) for key in ("added_nodes", "removed_nodes", "modified_nodes", "added_links", "removed_links"))
+        if change_count == 0 and not diff_results["renamed_nodes"]:
+            self.report({'INFO'}, f"No differences to {name}")
+            return {'FINISHED'}
+
+        self.report({'INFO'}, f"{len(diff_results['added_nodes'])} added, {len(diff_results['removed_nodes'])} removed, "
+            f"{len(diff_results['modified_nodes'])} modified nodes, {len(diff_results['added_links'])} added and "
+            f"{len(diff_results['removed_links'])} removed links, {len(diff_results['changed_defaults'])} changed values")
+
+        if self.highlight:
+            nodes = tree.nodes
+            changed = set(diff_results["added_nodes"]) | set(diff_results["modified_nodes"])
+            changed.update(link[2] for link in diff_results["added_links"])
+            changed.update(link[2] for link in diff_results["removed_links"] if link[2] in nodes)
+            set_node_color([nodes[name] for name in diff_results["added_nodes"]], diff_added_color)
+            set_node_color([nodes[name] for name in diff_results["modified_nodes"]], diff_modified_color)
+            flags = np.fromiter((node.name in changed for node in nodes), dtype=bool, count=len(nodes))
+            nodes.foreach_set("select", flags)
+
+        context.window_manager.popup_menu(draw_diff_results, title=f"Changes since {name}", icon='INFO')
+        return {'FINISHED'}
+
+    def invoke(self, context, event):
+        if self.properties.is_property_set("other_tree"):
+            return self.execute(context)
+        context.window_manager.invoke_search_popup(self)
+        return {'RUNNING_MODAL'}
+
+
+subgraph_candidates = []
+subgraph_candidate_items = []
+subgraph_mining_settings = {"min_size": 5, "max_size": 30, "min_count": 3}
+group_node_idnames = {
+    'ShaderNodeTree': 'ShaderNodeGroup',
+    'GeometryNodeTree': 'GeometryNodeGroup',
+    'CompositorNodeTree': 'CompositorNodeGroup',
+    'TextureNodeTree': 'TextureNodeGroup',
+}
+socket_base_types = {
+    'VALUE': 'NodeSocketFloat', 'INT': 'NodeSocketInt', 'BOOLEAN': 'NodeSocketBool', 'VECTOR': 'NodeSocketVector',
+    'RGBA': 'NodeSocketColor', 'STRING': 'NodeSocketString', 'SHADER': 'NodeSocketShader', 'GEOMETRY': 'NodeSocketGeometry',
+    'OBJECT': 'NodeSocketObject', 'COLLECTION': 'NodeSocketCollection', 'IMAGE': 'NodeSocketImage',
+    'MATERIAL': 'NodeSocketMaterial', 'TEXTURE': 'NodeSocketTexture', 'ROTATION': 'NodeSocketRotation',
+    'MATRIX': 'NodeSocketMatrix', 'MENU': 'NodeSocketMenu',
+}
+
+def is_factorable(node):
+    return is_mergeable(node) and not any(getattr(socket, "is_multi_input", False) for socket in node.inputs)
+
+def local_node_key(node):
+    settings = tuple((prop_id, rna_value_key(getattr(node, prop_id, None))) for prop_id in node_property_ids(node))
+    inputs = tuple((socket.identifier, socket.enabled, None if socket.is_linked else socket_value_key(socket)) for socket in node.inputs)
+    return (node.bl_idname, node.mute, settings, inputs)
+
+def tree_cones(tree, min_size, max_size):
+    # Yields the largest fanout-free cone above every node: upstream nodes whose outputs are only used
+    # inside the cone, so the whole cone can be replaced by one group node with the root's outputs.
+    consumers = {}
+    sources = {}
+    for link in tree.links:
+        consumers.setdefault(link.from_node.name, set()).add(link.to_node.name)
+        sources.setdefault((link.to_node.name, link.to_socket.identifier), link)
+
+    nodes = tree.nodes
+    eligible = set(node.name for node in nodes if is_factorable(node))
+    local_keys = {}
+
+    for root in nodes:
+        if root.name not in eligible:
+            continue
+        cone = {root.name}
+        queue = deque(socket_source.from_node.name for socket_source in
+            (sources.get((root.name, socket.identifier)) for socket in root.inputs) if socket_source is not None)
+        while queue and len(cone) < max_size:
+            name = queue.popleft()
+            if name in cone or name not in eligible or not consumers.get(name, set()) <= cone:
+                continue
+            cone.add(name)
+            node = nodes[name]
+            queue.extend(socket_source.from_node.name for socket_source in
+                (sources.get((name, socket.identifier)) for socket in node.inputs) if socket_source is not None)
+        if len(cone) < min_size:
+            continue
+
+        # Canonical encoding of the cone, visiting inputs in socket order. Inputs fed from outside
+        # of the cone become the slots of the group interface, in the same order for every occurrence.
+        order = {}
+        slots = []
+        def encode(node):
+            if node.name in order:
+                return ('REF', order[node.name])
+            order[node.name] = len(order)
+            if node.name not in local_keys:
+                local_keys[node.name] = local_node_key(node)
+            parts = [local_keys[node.name]]
+            for socket in node.inputs:
+                link = sources.get((node.name, socket.identifier))
+                if link is None:
+                    continue
+                if link.from_node.name in cone:
+                    parts.append((socket.identifier, link.from_socket.identifier, encode(link.from_node)))
+                else:
+                    slots.append((node.name, socket.identifier))
+                    parts.append((socket.identifier, 'EXT'))
+            return tuple(parts)
+
+        encoded = encode(root)
+        if len(order) != len(cone):
+            continue
+        key = hashlib.blake2b(repr((tree.bl_idname, encoded)).encode(), digest_size=16).hexdigest()
+        yield key, root.name, frozenset(cone), slots
+
+def mine_repeated_subgraphs(min_size, max_size, min_count):
+    patterns = {}
+    for tree_key, tree in iter_data_trees():
+        if tree.bl_idname not in group_node_idnames:
+            continue
+        for key, root_name, cone, slots in tree_cones(tree, min_size, max_size):
+            patterns.setdefault(key, []).append((tree_key, root_name, cone, slots))
+
+    # Larger cones contain the cones of their upstream nodes, so the patterns saving the most nodes
+    # claim their nodes first and overlapping occurrences of smaller patterns are dropped
+    def saving(occurrences):
+        size = len(occurrences[0][2])
+        return len(occurrences) * (size - 1) - (size + 2)
+
+    candidates = []
+    claimed = set()
+    for key, occurrences in sorted(patterns.items(), key=lambda item: saving(item[1]), reverse=True):
+        if len(occurrences) < min_count:
+            continue
+        occurrences = [occurrence for occurrence in occurrences
+            if not any((occurrence[0], name) in claimed for name in occurrence[2])]
+        if len(occurrences) < min_count or saving(occurrences) <= 0:
+            continue
+        claimed.update((occurrence[0], name) for occurrence in occurrences for name in occurrence[2])
+        tree_key, root_name = occurrences[0][:2]
+        candidates.append({
+            "key": key,
+            "size": len(occurrences[0][2]),
+            "count": len(occurrences),
+            "saving": saving(occurrences),
+            "root": resolve_tree_owner(tree_key).nodes[root_name].bl_idname,
+            "occurrences": occurrences,
+        })
+    return candidates
+
+def create_subgraph_group(tree_key, tree, occurrence, name):
+    _, root_name, cone, slots = occurrence
+    records = []
+    for record in iter_tree_records(tree_key, tree):
+        if record["type"] == "node" and record["name"] in cone:
+            records.append(dict(record, parent=None))
+        elif record["type"] == "link" and record["from"][0] in cone and record["to"][0] in cone:
+            records.append(record)
+
+    nodes = tree.nodes
+    root = nodes[root_name]
+    input_sockets = [next(socket for socket in nodes[node_name].inputs if socket.identifier == identifier) for node_name, identifier in slots]
+    output_sockets = [socket for socket in root.outputs if socket.enabled]
+    sockets = ([('INPUT', socket.name, socket_base_types.get(socket.type, socket.bl_idname)) for socket in input_sockets]
+        + [('OUTPUT', socket.name, socket_base_types.get(socket.type, socket.bl_idname)) for socket in output_sockets])
+
+    group = bpy.data.node_groups.new(name, tree.bl_idname)
+    create_interface_sockets(group, sockets)
+    _, failed = build_tree(group, records)
+
+    group_nodes = group.nodes
+    locations = [record["location"] for record in records if record["type"] == "node"]
+    group_input = group_nodes.new('NodeGroupInput')
+    group_input.location = (min(x for x, _ in locations) - 250, max(y for _, y in locations))
+    group_output = group_nodes.new('NodeGroupOutput')
+    group_output.location = (max(x for x, _ in locations) + 250, max(y for _, y in locations))
+    for i, (node_name, identifier) in enumerate(slots):
+        to_socket = next(socket for socket in group_nodes[node_name].inputs if socket.identifier == identifier)
+        group.links.new(group_input.outputs[i], to_socket)
+    for i, socket in enumerate(output_sockets):
+        from_socket = next(other for other in group_nodes[root_name].outputs if other.identifier == socket.identifier)
+        group.links.new(from_socket, group_output.inputs[i])
+    return group, failed
+
+def replace_subgraph(tree, occurrence, group):
+    _, root_name, cone, slots = occurrence
+    nodes = tree.nodes
+    root = nodes[root_name]
+    incoming = {(link.to_node.name, link.to_socket.identifier): link.from_socket for link in tree.links
+        if link.to_node.name in cone and link.from_node.name not in cone}
+    outgoing = [(link.from_socket.identifier, link.to_socket) for link in tree.links
+        if link.from_node.name == root_name and link.to_node.name not in cone]
+    output_ids = [socket.identifier for socket in root.outputs if socket.enabled]
+
+    group_node = nodes.new(group_node_idnames[tree.bl_idname])
+    group_node.node_tree = group
+    group_node.parent = root.parent
+    group_node.location = root.location
+    for i, slot in enumerate(slots):
+        if slot in incoming:
+            tree.links.new(incoming[slot], group_node.inputs[i])
+    for identifier, to_socket in outgoing:
+        if identifier in output_ids:
+            tree.links.new(group_node.outputs[output_ids.index(identifier)], to_socket)
+
+    for name in cone:
+        nodes.remove(nodes[name])
+
+def stored_subgraph_items(self, context):
+    subgraph_candidate_items.clear()
+    for candidate in subgraph_candidates:
+        subgraph_candidate_items.append((candidate["key"], f"{candidate['size']} nodes x {candidate['count']} ({candidate['root']})",
+            f"Saves about {candidate['saving']} nodes", 'NODETREE', len(subgraph_candidate_items)))
+    if not subgraph_candidate_items:
+        subgraph_candidate_items.append(('NONE', "No Candidates", "Run Find Repeated Subgraphs first", 'INFO', 0))
+    return subgraph_candidate_items
+
+
+class NODEUTILS_OT_FIND_REPEATED_SUBGRAPHS(bpy.types.Operator, NodeUtilsBase):
+    bl_label = "Find Repeated Subgraphs"
+    bl_idname = "nd_utils.find_repeated_subgraphs"
+    bl_description = "Finds node patterns that repeat across all node trees of the file and could be shared as node groups"
+    bl_options = {'REGISTER'}
+
+    min_size: IntProperty(name="Min Nodes", default=5, min=2, max=100)
+    max_size: IntProperty(name="Max Nodes", default=30, min=2, max=200)
+    min_count: IntProperty(name="Min Occurrences", default=3, min=2)
+
+    def execute(self, context):
+        subgraph_mining_settings.update(min_size=self.min_size, max_size=max(self.min_size, self.max_size), min_count=self.min_count)
+        subgraph_candidates[:] = mine_repeated_subgraphs(**subgraph_mining_settings)
+        if not subgraph_candidates:
+            self.report({'INFO'}, "No repeated subgraphs found")
+            return {'CANCELLED'}
+
+        occurrences = sum(candidate["count"] for candidate in subgraph_candidates)
+        saving = sum(candidate["saving"] for candidate in subgraph_candidates)
+        self.report({'INFO'}, f"{len(subgraph_candidates)} patterns with {occurrences} occurrences, "
+            f"factoring them would remove about {saving} nodes")
+        return {'FINISHED'}
+
+    def invoke(self, context, event):
+        return context.window_manager.invoke_props_dialog(self)
+
+
+class NODEUTILS_OT_FACTOR_REPEATED_SUBGRAPH(bpy.types.Operator, NodeUtilsBase):
+    bl_label = "Factor Repeated Subgraph"
+    bl_idname = "nd_utils.factor_repeated_subgraph"
+    bl_description = "Replaces every occurrence of a repeated pattern with an instance of one shared node group"
+    bl_property = "candidate"
+
+    candidate: EnumProperty(name="Pattern", items=stored_subgraph_items)
+
+    def execute(self, context):
+        if self.candidate == 'NONE':
+            return {'CANCELLED'}
+
+        # Trees may have changed since the analysis, so the pattern is looked up in a fresh one
+        candidates = mine_repeated_subgraphs(**subgraph_mining_settings)
+        candidate = next((candidate for candidate in candidates if candidate["key"] == self.candidate), None)
+        if candidate is None:
+            self.report({'WARNING'}, "Pattern no longer repeats, run the analysis again")
+            return {'CANCELLED'}
+
+        tree_key = candidate["occurrences"][0][0]
+        group, failed = create_subgraph_group(tree_key, resolve_tree_owner(tree_key), candidate["occurrences"][0], f"Shared {candidate['root']}")
+        for occurrence in candidate["occurrences"]:
+            replace_subgraph(resolve_tree_owner(occurrence[0]), occurrence, group)
+
+        subgraph_candidates[:] = mine_repeated_subgraphs(**subgraph_mining_settings)
+        self.report({'INFO'}, f"Replaced {candidate['count']} occurrences with '{group.name}', "
+            f"removed {candidate['count'] * (candidate['size'] - 1)} nodes")
+        if failed:
+            self.report({'WARNING'}, f"{len(failed)} properties could not be copied into the group: {', '.join(failed[:5])}" + (", ..." if len(failed) > 5 else ""))
+        return {'FINISHED'}
+
+    def invoke(self, context, event):
+        if self.properties.is_property_set("candidate"):
+            return self.execute(context)
+        context.window_manager.invoke_search_popup(self)
+        return {'RUNNING_MODAL'}
+
+
+def snapshot_tree(tree):
+    # Plain python copy of the tree's structure, so analyses never have to go back to RNA
+    nodes = tree.nodes
+    names = [node.name for node in nodes]
+    index = {name: i for i, name in enumerate(names)}
+    groups = []
+    for node in nodes:
+        group_tree = getattr(node, "node_tree", None) if node.bl_static_type == 'GROUP' else None
+        groups.append(group_tree.name_full if group_tree else None)
+
+    sizes = np.empty(2*len(nodes), dtype=np.float32)
+    nodes.foreach_get("dimensions", sizes)
+    sizes /= get_ui_scale()
+    locations = np.empty(2*len(nodes), dtype=np.float32)
+    nodes.foreach_get("location", locations)
+    frame_index = FrameIndex(nodes)
+    locations += np.array([frame_index.parent_offset(node) for node in nodes], dtype=np.float32).reshape(-1)
+
+    return {
+        "tree": tree.name_full,
+        "tree_type": tree.bl_idname,
+        "names": names,
+        "types": [node.bl_static_type for node in nodes],
+        "idnames": [node.bl_idname for node in nodes],
+        "groups": groups,
+        "parents": [node.parent.name if node.parent else None for node in nodes],
+        "sizes": typed_array('f', sizes.tobytes()),
+        "locations": typed_array('f', locations.tobytes()),
+        "sockets": [(tuple(socket.type for socket in node.inputs), tuple(socket.type for socket in node.outputs)) for node in nodes],
+        "links": [(index[link.from_node.name], index[link.to_node.name]) for link in tree.links],
+    }
+
+profiler_results = {}
+
+def profile_tree(tree, memo=None):
+    # Each group datablock is only profiled once, however many times it is instanced
+    if memo is None:
+        memo = {}
+    if tree.name_full in memo:
+        return memo[tree.name_full]
+
+    # Metrics come from the analysis cache and are only recomputed when the tree changed
+    snapshot, analysis = get_tree_analysis(tree)
+    profile = dict(analysis["metrics"], tree=tree.name_full)
+    profile["unreachable_count"] = len(analysis["unreachable"])
+    profile["dangling_reroute_count"] = int(np.count_nonzero(analysis["reroutes"][:, 1] < 0))
+    memo[tree.name_full] = profile
+
+    group_trees = {}
+    for node in tree.nodes:
+        group_tree = getattr(node, "node_tree", None) if node.bl_static_type == 'GROUP' else None
+        if group_tree is not None:
+            group_trees[group_tree.name_full] = group_tree
+
+    instances = Counter()
+    expanded_count = profile["node_count"]
+    for group_name, count in Counter(group for group in snapshot["groups"] if group).items():
+        group_profile = profile_tree(group_trees[group_name], memo)
+        instances[group_name] += count
+        for nested_name, nested_count in group_profile["group_instances"].items():
+            instances[nested_name] += count * nested_count
+        expanded_count += count * group_profile["expanded_node_count"]
+
+    profile["group_instances"] = dict(instances.most_common())
+    profile["expanded_node_count"] = expanded_count
+    return profile
+
+def heat_color(factor):
+    cold, warm, hot = (0.15, 0.3, 0.6), (0.8, 0.65, 0.15), (0.8, 0.15, 0.1)
+    if factor < 0.5:
+        start, end, factor = cold, warm, factor * 2
+    else:
+        start, end, factor = warm, hot, factor * 2 - 1
+    return tuple(a + (b - a) * factor for a, b in zip(start, end))
+
+
+class NODEUTILS_OT_PROFILE_TREE(bpy.types.Operator, NodeUtilsBase):
+    bl_label = "Profile Tree"
+    bl_idname = "nd_utils.profile_tree"
+    bl_description = "Measures node counts, depth, fan-in/fan-out and group usage of the current tree"
+    bl_options = {'REGISTER', 'UNDO_GROUPED'}
+
+    heatmap: BoolProperty(name="Heatmap", default=False,
+        description="Overwrite node colors with a heatmap of their connectivity and nested group size")
+    heat_levels = 8
+
+    def execute(self, context):
+        tree = get_tree(context)
+        memo = {}
+        profile = profile_tree(tree, memo)
+        profiler_results.update(memo)
+        evict_analysis_cache(analysis_cache_dir(), fetch_user_preferences().analysis_cache_size * 1024 * 1024)
+
+        self.report({'INFO'}, f"{profile['node_count']} nodes, {profile['link_count']} links, "
+            f"depth {profile['max_depth']}, {profile['expanded_node_count']} nodes when groups are expanded")
+
+        if not self.heatmap:
+            return {'FINISHED'}
+
+        nodes = tuple(node for node in tree.nodes if node.bl_static_type != 'FRAME')
+        degrees = dict.fromkeys((node.name for node in nodes), 0)
+        for link in tree.links:
+            degrees[link.from_node.name] = degrees.get(link.from_node.name, 0) + 1
+            degrees[link.to_node.name] = degrees.get(link.to_node.name, 0) + 1
+
+        heat = {}
+        for node in nodes:
+            group_tree = getattr(node, "node_tree", None) if node.bl_static_type == 'GROUP' else None
+            group_cost = memo[group_tree.name_full]["expanded_node_count"] if group_tree else 0
+            heat[node.name] = degrees[node.name] + group_cost
+
+        max_heat = max(heat.values(), default=0)
+        if max_heat == 0:
+            return {'FINISHED'}
+
+        buckets = {}
+        for node in nodes:
+            level = round(heat[node.name] / max_heat * (self.heat_levels - 1))
+            buckets.setdefault(level, []).append(node)
+        for level, bucket in buckets.items():
+            set_node_color(bucket, heat_color(level / (self.heat_levels - 1)))
+        return {'FINISHED'}
+
+
+analysis_results = {}
+
+def run_tree_analyses(snapshots, layout_settings=None, workers=0, stats=None):
+    # Yields analysis results as they finish. Snapshots are plain python data, so they are analyzed
+    # in spawned worker processes when there are enough of them, and serially otherwise or on failure.
+    stats = {} if stats is None else stats
+    workers = min(workers or os.cpu_count() or 1, len(snapshots))
+    finished = set()
+    if workers > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+                futures = [executor.submit(analyze_snapshot, snapshot, layout_settings) for snapshot in snapshots]
+                stats["workers"] = workers
+                for future in as_completed(futures):
+                    result = future.result()
+                    finished.add(result["tree"])
+                    yield result
+            return
+        except (BrokenProcessPool, OSError, ImportError) as error:
+            stats["fallback"] = str(error)
+
+    stats["workers"] = 1
+    for snapshot in snapshots:
+        if snapshot["tree"] not in finished:
+            yield analyze_snapshot(snapshot, layout_settings)
+
+def apply_tree_layout(tree, layout):
+    layout_ids, positions = layout
+    nodes = tree.nodes
+    if not layout_ids:
+        return
+    with deframe_nodes(nodes[i] for i in layout_ids):
+        locations = np.empty(2*len(nodes), dtype=np.float32)
+        nodes.foreach_get("location", locations)
+        locations = locations.reshape(-1, 2)
+        origin = (locations[layout_ids, 0].min(), locations[layout_ids, 1].max())
+        locations[layout_ids] = np.asarray(positions, dtype=np.float32) + origin
+        nodes.foreach_set("location", locations.ravel())
+
+
+analysis_cache_version = 2
+# JSON and array results each cached part is stored as, once converted by analysis_arrays
+analysis_cache_parts = {
+    "structure": (("metrics", "kinds"), ("reroutes", "unreachable", "kind_nodes")),
+    "sockets": (("socket_types",), ("socket_table",)),
+    "frames": ((), ("frame_ids", "frame_bounds")),
+}
+
+def snapshot_content_hashes(snapshot):
+    # One hash per cached part, covering only the snapshot fields that part reads
+    hashes = {}
+    for part, (fields, _) in analysis_parts.items():
+        digest = hashlib.blake2b(repr((analysis_cache_version, part, snapshot["tree_type"])).encode(), digest_size=20)
+        for field in fields:
+            value = snapshot[field]
+            digest.update(value.tobytes() if isinstance(value, array) else repr(value).encode())
+        hashes[part] = digest.hexdigest()
+    return hashes
+
+def analysis_cache_dir():
+    prefs = fetch_user_preferences()
+    if prefs.analysis_cache_location == 'BLEND' and bpy.data.filepath:
+        path = Path(bpy.data.filepath).parent / ".nd_utils_cache"
+    else:
+        path = Path(bpy.utils.user_resource('DATAFILES', path="nodetree_utils_cache"))
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+def read_cached_part(cache_dir, part, content_hash):
+    # Arrays stay memory mapped, only the slices that are used get read from disk
+    json_keys, array_keys = analysis_cache_parts[part]
+    paths = [cache_dir / (content_hash + ".json")] + [cache_dir / f"{content_hash}.{key}.npy" for key in array_keys]
+    if not all(path.exists() for path in paths):
+        return None
+    try:
+        data = json.loads(paths[0].read_text(encoding='utf-8'))
+        data = {key: data[key] for key in json_keys}
+        for key, path in zip(array_keys, paths[1:]):
+            data[key] = np.load(path, mmap_mode='r')
+    except (OSError, ValueError, KeyError):
+        return None
+
+    # Reading counts as a use for the eviction order
+    for path in paths:
+        os.utime(path)
+    return data
+
+def write_cached_part(cache_dir, part, content_hash, result):
+    json_keys, array_keys = analysis_cache_parts[part]
+    for key in array_keys:
+        np.save(cache_dir / f"{content_hash}.{key}.npy", result[key])
+    (cache_dir / (content_hash + ".json")).write_text(
+        json.dumps({key: result[key] for key in json_keys}), encoding='utf-8')
+
+def analysis_arrays(result):
+    # Converts fresh results to the layout of the memory mapped arrays read back from the cache
+    if isinstance(result.get("reroutes"), dict):
+        # (reroute, source) rows with -1 for unconnected chains
+        result["reroutes"] = np.array([(i, -1 if source is None else source) for i, source in result["reroutes"].items()], dtype=np.int32).reshape(-1, 2)
+        result["unreachable"] = np.asarray(result["unreachable"], dtype=np.int32)
+    if "kinds" in result and "kind_nodes" not in result:
+        # Node indices grouped by type, with the range of every type in kinds
+        kinds = {}
+        position = 0
+        for idname, indices in result["kinds"].items():
+            kinds[idname] = (position, position + len(indices))
+            position += len(indices)
+        result["kind_nodes"] = np.fromiter(itertools.chain(*result["kinds"].values()), dtype=np.int32, count=position)
+        result["kinds"] = kinds
+    if "sockets" in result:
+        sockets = result.pop("sockets")
+        result["socket_types"] = sockets["types"]
+        result["socket_table"] = np.array(sockets["rows"], dtype=np.int32).reshape(-1, 4)
+    if "frames" in result:
+        frames = result.pop("frames")
+        result["frame_ids"] = np.array([frame for frame, _ in frames], dtype=np.int32)
+        result["frame_bounds"] = np.array([bounds if bounds is not None else (np.nan,) * 4 for _, bounds in frames], dtype=np.float32).reshape(-1, 4)
+    return result
+
+def analysis_kind_nodes(result, idname):
+    start, stop = result["kinds"].get(idname, (0, 0))
+    return result["kind_nodes"][start:stop]
+
+def evict_analysis_cache(cache_dir, max_bytes):
+    # Least recently used entries go first, using the modification time that reads refresh
+    entries = {}
+    for path in cache_dir.iterdir():
+        content_hash = path.name.split(".", 1)[0]
+        stat = path.stat()
+        size, used, paths = entries.get(content_hash, (0, 0.0, ()))
+        entries[content_hash] = (size + stat.st_size, max(used, stat.st_mtime), paths + (path,))
+
+    total = sum(size for size, _, _ in entries.values())
+    for size, _, paths in sorted(entries.values(), key=lambda entry: entry[1]):
+        if total <= max_bytes:
+            break
+        for path in paths:
+            path.unlink(missing_ok=True)
+        total -= size
+
+def cached_tree_analysis(snapshot, cache_dir, content_hashes=None):
+    # Fills the tree's result with every part that is unchanged, in memory first, then on disk.
+    # Returns the result and the parts that still have to be analyzed.
+    content_hashes = content_hashes or snapshot_content_hashes(snapshot)
+    result = analysis_results.get(snapshot["tree"])
+    if result is None:
+        result = analysis_results[snapshot["tree"]] = {"tree": snapshot["tree"], "content_hashes": {}}
+    missing = []
+    for part, content_hash in content_hashes.items():
+        if result["content_hashes"].get(part) == content_hash:
+            continue
+        data = read_cached_part(cache_dir, part, content_hash)
+        if data is None:
+            result["content_hashes"].pop(part, None)
+            missing.append(part)
+        else:
+            result.update(data)
+            result["content_hashes"][part] = content_hash
+    return result, missing
+
+def store_tree_analysis(cache_dir, content_hashes, result, parts=None):
+    # Merges fresh results into the tree's cached result, writing the given parts to disk
+    result.pop("timings", None)
+    analysis_arrays(result)
+    cached = analysis_results.setdefault(result["tree"], {"tree": result["tree"], "content_hashes": {}})
+    cached.update((key, value) for key, value in result.items() if key != "content_hashes")
+    for part in analysis_parts if parts is None else parts:
+        write_cached_part(cache_dir, part, content_hashes[part], cached)
+        cached["content_hashes"][part] = content_hashes[part]
+    return cached
+
+def get_tree_analysis(tree, cache_dir=None):
+    # Looked up lazily on first use, so nothing is read or computed until an operator needs it,
+    # and only the parts whose inputs changed are analyzed again
+    snapshot = snapshot_tree(tree)
+    cache_dir = cache_dir or analysis_cache_dir()
+    content_hashes = snapshot_content_hashes(snapshot)
+    result, missing = cached_tree_analysis(snapshot, cache_dir, content_hashes)
+    if missing:
+        result = store_tree_analysis(cache_dir, content_hashes, analyze_snapshot(snapshot, parts=missing), missing)
+    return snapshot, result
+
+@persistent
+def analysis_cache_load_handler(dummy):
+    analysis_results.clear()
+
+
+class NODEUTILS_OT_ANALYZE_TREES(bpy.types.Operator, NodeUtilsBase):
+    bl_label = "Analyze All Trees"
+    bl_idname = "nd_utils.analyze_trees"
+    bl_description = "Computes metrics, reroute sources and unreachable nodes of every node tree, using several processes for large files"
+
+    workers: IntProperty(name="Workers", default=0, min=0, max=256,
+        description="Number of worker processes, zero uses one per CPU core and one analyzes on the main thread")
+    apply_layout: BoolProperty(name="Apply Layout", default=False,
+        description="Also arrange every tree with the auto layout")
+
+    def execute(self, context):
+        start = time.perf_counter()
+        trees = {tree.name_full: tree for _, tree in iter_data_trees()}
+        snapshots = [snapshot_tree(tree) for tree in trees.values()]
+        snapshot_time = time.perf_counter() - start
+        if not snapshots:
+            return {'CANCELLED'}
+
+        # Unchanged trees come from the cache, unless a layout has to be computed for them anyway
+        cache_dir = analysis_cache_dir()
+        content_hashes = {snapshot["tree"]: snapshot_content_hashes(snapshot) for snapshot in snapshots}
+        cached = []
+        if not self.apply_layout:
+            cached = [snapshot for snapshot in snapshots
+                if not cached_tree_analysis(snapshot, cache_dir, content_hashes[snapshot["tree"]])[1]]
+            cached_names = set(snapshot["tree"] for snapshot in cached)
+            snapshots = [snapshot for snapshot in snapshots if snapshot["tree"] not in cached_names]
+
+        layout_settings = {"spacing_x": 80.0, "spacing_y": 40.0, "sweeps": 4} if self.apply_layout else None
+        stats = {}
+        stage_times = Counter()
+        apply_time = 0.0
+        unreachable = 0
+        analysis_start = time.perf_counter()
+        for snapshot in cached:
+            unreachable += len(analysis_results[snapshot["tree"]]["unreachable"])
+        for result in run_tree_analyses(snapshots, layout_settings, self.workers, stats) if snapshots else ():
+            apply_start = time.perf_counter()
+            stage_times.update(result.pop("timings"))
+            layout = result.pop("layout", None)
+            if layout is not None:
+                # Moving the nodes only changes the frame bounds, the other parts stay valid
+                apply_tree_layout(trees[result["tree"]], layout)
+                result.pop("frames")
+                store_tree_analysis(cache_dir, content_hashes[result["tree"]], result, ("structure", "sockets"))
+            else:
+                store_tree_analysis(cache_dir, content_hashes[result["tree"]], result)
+            unreachable += len(result["unreachable"])
+            apply_time += time.perf_counter() - apply_start
+        analysis_time = time.perf_counter() - analysis_start - apply_time
+        evict_analysis_cache(cache_dir, fetch_user_preferences().analysis_cache_size * 1024 * 1024)
+
+        if "fallback" in stats:
+            self.report({'WARNING'}, f"Worker processes failed, analyzed serially: {stats['fallback']}")
+        stages = ", ".join(f"{name} {seconds*1000:.0f} ms" for name, seconds in stage_times.items())
+        self.report({'INFO'}, f"Analyzed {len(snapshots)} trees with {stats.get('workers', 0)} process(es), {len(cached)} from cache, "
+            f"{unreachable} unreachable nodes. "
+            f"Snapshot {snapshot_time*1000:.0f} ms, analysis {analysis_time*1000:.0f} ms ({stages}), apply {apply_time*1000:.0f} ms")
+        return {'FINISHED'}
+
+    def invoke(self, context, event):
+        return context.window_manager.invoke_props_dialog(self)
+
+
+class NODEUTILS_OT_EXPORT_PROFILE(bpy.types.Operator, NodeUtilsBase, ExportHelper):
+    bl_label = "Export Tree Profile"
+    bl_idname = "nd_utils.export_profile"
+    bl_description = "Writes the profile of the current tree and its nested groups to a JSON file"
+    bl_options = {'REGISTER'}
+
+    filename_ext = ".json"
+    filter_glob: StringProperty(default="*.json", options={'HIDDEN'})
+
+    def execute(self, context):
+        tree = get_tree(context)
+        memo = {}
+        profile_tree(tree, memo)
+        profiler_results.update(memo)
+
+        with open(self.filepath, 'w', encoding='utf-8') as file:
+            json.dump({"root": tree.name_full, "trees": memo}, file, indent=2)
+        self.report({'INFO'}, f"Exported profile of {len(memo)} trees to {self.filepath}")
+        return {'FINISHED'}
+
+
+class NODEUTILS_OT_SELECT_FRAME_CONTENTS(bpy.types.Operator, NodeUtilsBase):
+    bl_label = "Select Frame Contents"
+    bl_idname = "nd_utils.select_frame_contents"
+    bl_description = "Selects every node inside the selected frames, including nested frames, using the current selection mode"
+
+    def execute(self, context):
+        prefs = fetch_user_preferences()
+        selection_mode = context.window_manager.nd_utils_props.selection_mode
+        nodes = get_nodes(context)
+        selected_nodes = set(node for node in nodes if node.select)
+        selected_frames = tuple(node for node in selected_nodes if node.bl_static_type == 'FRAME')
+        if not selected_frames:
+            return {'CANCELLED'}
+
+        index = FrameIndex(nodes)
+        contents = set(itertools.chain.from_iterable(index.descendants(frame.name) for frame in selected_frames))
+        nodes_to_select = combine_selection(selection_mode, selected_nodes, contents)
+        if nodes_to_select is None:
+            return {'CANCELLED'}
+
+        if prefs.ignore_empty_selections:
+            if (selection_mode == "New" or selection_mode == "Intersection") and not nodes_to_select:
+                self.report({'INFO'}, 'Selected frames are empty. Ignoring selection.')
+                return {'CANCELLED'}
+        if nodes_to_select == selected_nodes:
+            return {'CANCELLED'}
+
+        record_selection(nodes.id_data)
+        nodes.foreach_set("select", tuple(node in nodes_to_select for node in nodes))
+        record_selection(nodes.id_data)
+        context.area.tag_redraw()
+        return {'FINISHED'}
+
+
+class NODEUTILS_OT_SHRINK_FRAMES(bpy.types.Operator, NodeUtilsBase):
+    bl_label = "Shrink Frames to Fit"
+    bl_idname = "nd_utils.shrink_frames"
+    bl_description = "Makes frames shrink to fit their contents"
+
+    selected_only: BoolProperty(name="Selected Only", default=False,
+        description="Only shrink selected frames")
+
+    def execute(self, context):
+        frames = tuple(node for node in get_nodes(context) if node.bl_static_type == 'FRAME'
+            and not node.shrink and (node.select or not self.selected_only))
+        if not frames:
+            return {'CANCELLED'}
+
+        for frame in frames:
+            frame.shrink = True
+        self.report({'INFO'}, f"Shrunk {len(frames)} frames")
+        return {'FINISHED'}
+
+
+class NODEUTILS_OT_FRAME_APPLY(bpy.types.Operator, NodeUtilsBase):
+    bl_label = "Apply per Frame"
+    bl_idname = "nd_utils.frame_apply"
+    bl_description = "Applies an operation to the contents of each frame separately"
+
+    frame_operation: EnumProperty(name='frame_operation', items=(
+        ('NORMALIZE_MAX', 'NORMALIZE_MAX', ''), 
+        ('NORMALIZE_MIN', 'NORMALIZE_MIN', ''), 
+        ('NORMALIZE_AVERAGE', 'NORMALIZE_AVERAGE', ''), 
+        ('RECENTER', 'RECENTER', ''),))
+    selected_only: BoolProperty(name="Selected Only", default=False,
+        description="Only apply to selected frames")
+
+    @classmethod
+    def description(self, context, props):
+        if props.frame_operation == 'RECENTER':
+            return "Centers the contents of each fixed-size frame within it"
+        return f"Normalizes node widths within each frame by their {props.frame_operation[10:].lower()}"
+
+    def normalized_widths(self, index, frames, use_unique):
+        new_widths = []
+        for frame in frames:
+            frame_nodes = tuple(node for node in index.children[frame.name] 
+                if node.bl_static_type != 'FRAME' and node.bl_static_type != 'REROUTE')
+            if len(frame_nodes) <= 1:
+                continue
+
+            width_init = (node.dimensions.x for node in frame_nodes)
+            node_widths = set(width_init) if use_unique else tuple(width_init)
+            if self.frame_operation == 'NORMALIZE_AVERAGE':
+                width_to_set = sum(node_widths)/len(node_widths)
+            else:
+                width_to_set = min(node_widths) if self.frame_operation == 'NORMALIZE_MIN' else max(node_widths)
+            new_widths.extend((node, width_to_set) for node in frame_nodes if node.width != width_to_set)
+        return new_widths
+
+    def recentered_locations(self, index, frames):
+        # Innermost frames go first. A fixed-size frame is bounded by its own rectangle in its parent,
+        # so recentering its contents never shifts the parent, which then moves it as a whole
+        scale = get_ui_scale()
+        depths = {}
+        new_locations = []
+        for frame in sorted(frames, key=lambda frame: index.depth(frame, depths), reverse=True):
+            if frame.shrink or index.bounds[frame.name] is None:
+                continue
+
+            child_bounds = []
+            for child in index.children[frame.name]:
+                if child.bl_static_type != 'FRAME':
+                    child_bounds.append(index.node_bounds(child, scale))
+                elif not child.shrink:
+                    child_bounds.append(self.frame_rect(index, child))
+                elif index.bounds[child.name] is not None:
+                    child_bounds.append(index.bounds[child.name])
+            if not child_bounds:
+                continue
+
+            left, top, right, bottom = self.frame_rect(index, frame)
+            delta_x = 0.5*(left + right) - 0.5*(min(b[0] for b in child_bounds) + max(b[2] for b in child_bounds))
+            delta_y = 0.5*(top + bottom) - 0.5*(max(b[1] for b in child_bounds) + min(b[3] for b in child_bounds))
+            if round(delta_x, 2) == 0 and round(delta_y, 2) == 0:
+                continue
+            new_locations.extend((node, (node.location.x + delta_x, node.location.y + delta_y)) 
+                for node in index.children[frame.name])
+        return new_locations
+
+    @staticmethod
+    def frame_rect(index, frame):
+        offset_x, offset_y = index.parent_offset(frame)
+        left = offset_x + frame.location.x
+        top = offset_y + frame.location.y
+        return (left, top, left + frame.width, top - frame.height)
+
+    def execute(self, context):
+        nodes = get_nodes(context)
+        index = FrameIndex(nodes)
+        frames = tuple(frame for frame in index.frames.values() if frame.select or not self.selected_only)
+        if not frames:
+            return {'CANCELLED'}
+
+        if self.frame_operation == 'RECENTER':
+            new_locations = self.recentered_locations(index, frames)
+            if not new_locations:
+                return {'CANCELLED'}
+            for node, location in new_locations:
+                node.location = location
+        else:
+            new_widths = self.normalized_widths(index, frames, fetch_user_preferences().use_unique)
+            if not new_widths:
+                return {'CANCELLED'}
+            for node, width in new_widths:
+                node.width = width
+        return {'FINISHED'}
+
+
+tree_owner_collections = (
+    ('node_groups', bpy.types.NodeTree),
+    ('materials', bpy.types.Material),
+    ('worlds', bpy.types.World),
+    ('scenes', bpy.types.Scene),
+    ('lights', bpy.types.Light),
+    ('textures', bpy.types.Texture),
+)
+
+def tree_owner_key(data_id):
+    # Stable reference to a node tree that survives undo, unlike the ID itself
+    if data_id is None or data_id.library is not None:
+        return None
+    for collection, id_type in tree_owner_collections:
+        if isinstance(data_id, id_type):
+            if id_type is bpy.types.NodeTree:
+                return None if data_id.is_embedded_data else (collection, data_id.name)
+            if getattr(data_id, "node_tree", None) is not None:
+                return (collection, data_id.name)
+    return None
+
+def resolve_tree_owner(key):
+    collection, name = key
+    data_id = getattr(bpy.data, collection).get(name)
+    if data_id is None or collection == 'node_groups':
+        return data_id
+    return data_id.node_tree
+
+def iter_data_trees():
+    for collection, _ in tree_owner_collections:
+        for data_id in getattr(bpy.data, collection):
+            key = tree_owner_key(data_id)
+            if key is not None:
+                yield key, (data_id if collection == 'node_groups' else data_id.node_tree)
+
+def link_identity(link):
+    return (link.from_node.name, link.from_socket.identifier, link.to_node.name, link.to_socket.identifier)
+
+def link_pointers(link):
+    # Much cheaper to read than link_identity, and changes whenever a link is added, removed or moved
+    return (link.as_pointer(), link.from_socket.as_pointer(), link.to_socket.as_pointer())
+
+reroute_link_states = {}
+auto_label_key = "nd_utils_auto_label"
+pending_label_trees = set()
+last_link_change = [0.0]
+
+def record_reroute_links(key, tree):
+    reroute_link_states[key] = {link_pointers(link): link_identity(link) for link in tree.links}
+
+def relabel_changed_reroutes(key, tree):
+    # Links are compared by pointers, names are only looked up for the links that changed.
+    # A tree seen for the first time only gets a baseline, its existing reroutes were not touched
+    if key not in reroute_link_states:
+        record_reroute_links(key, tree)
+        return 0
+    old_links = reroute_link_states[key]
+    current_pointers = set(link_pointers(link) for link in tree.links)
+    if current_pointers == old_links.keys():
+        return 0
+
+    added = current_pointers - old_links.keys()
+    changed_links = [identity for pointers, identity in old_links.items() if pointers not in current_pointers]
+    current_links = {pointers: identity for pointers, identity in old_links.items() if pointers in current_pointers}
+    for link in tree.links:
+        pointers = link_pointers(link)
+        if pointers in added:
+            current_links[pointers] = link_identity(link)
+            changed_links.append(current_links[pointers])
+    reroute_link_states[key] = current_links
+
+    nodes = tree.nodes
+    incoming = {}
+    outgoing = {}
+    for link in tree.links:
+        if link.to_node.bl_static_type == 'REROUTE':
+            incoming[link.to_node.name] = link
+        if link.from_node.bl_static_type == 'REROUTE':
+            outgoing.setdefault(link.from_node.name, []).append(link)
+
+    stack = [to_name for _, _, to_name, _ in changed_links]
+    affected = []
+    visited = set()
+    while stack:
+        name = stack.pop()
+        node = nodes.get(name)
+        if name in visited or node is None or node.bl_static_type != 'REROUTE':
+            continue
+        visited.add(name)
+        affected.append(node)
+        stack.extend(link.to_node.name for link in outgoing.get(name, ()))
+
+    # The last label given automatically is stored on the reroute, so it is recognized after reloading
+    def is_auto_labeled(reroute):
+        return reroute.label == '' or reroute.label == reroute.get(auto_label_key)
+
+    new_labels = {}
+    def resolve_label(reroute):
+        chain = []
+        label = ''
+        while True:
+            if reroute.name in new_labels:
+                label = new_labels[reroute.name]
+                break
+            if chain and not is_auto_labeled(reroute):
+                label = reroute.label
+                break
+            if reroute in chain:
+                break
+            chain.append(reroute)
+            link = incoming.get(reroute.name)
+            if link is None:
+                break
+            if link.from_node.bl_static_type != 'REROUTE':
+                label = link.from_socket.name
+                break
+            reroute = link.from_node
+        for node in chain:
+            new_labels[node.name] = label
+        return label
+
+    relabeled = 0
+    for reroute in affected:
+        if not is_auto_labeled(reroute):
+            continue
+        label = resolve_label(reroute)
+        if label != reroute.label:
+            reroute.label = label
+            relabeled += 1
+        if label:
+            reroute[auto_label_key] = label
+        elif auto_label_key in reroute:
+            del reroute[auto_label_key]
+    return relabeled
+
+def flush_pending_reroute_labels():
+    delay = fetch_user_preferences().auto_label_delay
+    elapsed = time.perf_counter() - last_link_change[0]
+    if elapsed < delay:
+        return delay - elapsed
+
+    for key in tuple(pending_label_trees):
+        tree = resolve_tree_owner(key)
+        if tree is not None:
+            relabel_changed_reroutes(key, tree)
+    pending_label_trees.clear()
+    return None
+
+def embedded_tree_owner_key(tree, updated_ids):
+    # Owners of changed embedded trees are almost always updated along with them
+    for data_id in itertools.chain(updated_ids, *(getattr(bpy.data, collection) for collection, _ in tree_owner_collections[1:])):
+        if not isinstance(data_id, bpy.types.NodeTree) and getattr(data_id, "node_tree", None) == tree:
+            return tree_owner_key(data_id)
+    return None
+
+@persistent
+def reroute_label_depsgraph_handler(scene, depsgraph):
+    # Only node tree updates count, a scene or material update alone never means a link changed
+    updated_ids = [update.id.original for update in depsgraph.updates]
+    keys = set()
+    for data_id in updated_ids:
+        if isinstance(data_id, bpy.types.NodeTree):
+            keys.add(embedded_tree_owner_key(data_id, updated_ids) if data_id.is_embedded_data else tree_owner_key(data_id))
+    keys.discard(None)
+    if not keys:
+        return
+
+    pending_label_trees.update(keys)
+    last_link_change[0] = time.perf_counter()
+    if not bpy.app.timers.is_registered(flush_pending_reroute_labels):
+        bpy.app.timers.register(flush_pending_reroute_labels, first_interval=fetch_user_preferences().auto_label_delay)
+
+@persistent
+def reroute_label_load_handler(dummy):
+    reroute_link_states.clear()
+    pending_label_trees.clear()
+    for key, tree in iter_data_trees():
+        record_reroute_links(key, tree)
+
+def record_all_reroute_links():
+    reroute_label_load_handler(None)
+    return None
+
+def set_auto_label_reroutes(enabled):
+    handlers = ((bpy.app.handlers.depsgraph_update_post, reroute_label_depsgraph_handler),
+        (bpy.app.handlers.load_post, reroute_label_load_handler))
+    for handler_list, handler in handlers:
+        if enabled and handler not in handler_list:
+            handler_list.append(handler)
+        elif not enabled and handler in handler_list:
+            handler_list.remove(handler)
+
+    # Data can't be read while the add-on registers, so the baseline is recorded once it is available
+    if enabled and not bpy.app.timers.is_registered(record_all_reroute_links):
+        bpy.app.timers.register(record_all_reroute_links, first_interval=0.0)
+    if not enabled:
+        reroute_link_states.clear()
+        pending_label_trees.clear()
+        for timer in (flush_pending_reroute_labels, record_all_reroute_links):
+            if bpy.app.timers.is_registered(timer):
+                bpy.app.timers.unregister(timer)
+
+def update_auto_label_reroutes(self, context):
+    set_auto_label_reroutes(self.auto_label_reroutes)
+
+
+offscreen_collapsed_key = "nd_utils_offscreen_collapsed"
+offscreen_collapsed_trees = set()
+offscreen_cache = {}
+offscreen_collapse_interval = 0.2
+offscreen_grid_cell = 600.0
+
+def space_tree_key(space):
+    tree = space.edit_tree
+    if tree is None:
+        return None
+    return tree_owner_key(space.id if tree.is_embedded_data else tree)
+
+def visible_node_rects():
+    # View rects of every open node editor in node space, grouped by the tree it shows
+    scale = get_ui_scale()
+    rects = {}
+    for window in bpy.context.window_manager.windows:
+        for area in window.screen.areas:
+            if area.type != 'NODE_EDITOR':
+                continue
+            key = space_tree_key(area.spaces.active)
+            region = next((region for region in area.regions if region.type == 'WINDOW'), None)
+            if key is None or region is None:
+                continue
+            left, bottom = region.view2d.region_to_view(0, 0)
+            right, top = region.view2d.region_to_view(region.width, region.height)
+            rects.setdefault(key, []).append((left / scale, bottom / scale, right / scale, top / scale))
+    return rects
+
+def build_node_grid(bounds, cell_size):
+    # Uniform grid over node bounds, mapping each cell to the indices of the nodes overlapping it
+    grid = {}
+    cells = np.floor(bounds / cell_size).astype(np.int64)
+    for i, (x0, y0, x1, y1) in enumerate(cells.tolist()):
+        for x in range(x0, x1 + 1):
+            for y in range(y0, y1 + 1):
+                grid.setdefault((x, y), []).append(i)
+    return grid
+
+def query_node_grid(grid, bounds, rects, margin, cell_size):
+    hits = np.zeros(len(bounds), dtype=bool)
+    for left, bottom, right, top in rects:
+        left, bottom, right, top = left - margin, bottom - margin, right + margin, top + margin
+        candidates = set()
+        for x in range(int(np.floor(left / cell_size)), int(np.floor(right / cell_size)) + 1):
+            for y in range(int(np.floor(bottom / cell_size)), int(np.floor(top / cell_size)) + 1):
+                candidates.update(grid.get((x, y), ()))
+        if not candidates:
+            continue
+        candidates = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+        b = bounds[candidates]
+        inside = (b[:, 0] <= right) & (b[:, 2] >= left) & (b[:, 1] <= top) & (b[:, 3] >= bottom)
+        hits[candidates[inside]] = True
+    return hits
+
+def get_offscreen_cache(key, nodes):
+    # The grid is only rebuilt when nodes were added, removed or moved
+    locations = np.empty(2*len(nodes), dtype=np.float32)
+    nodes.foreach_get("location", locations)
+    cache = offscreen_cache.get(key)
+    if cache is not None and np.array_equal(cache["locations"], locations):
+        return cache
+
+    dimensions = np.empty(2*len(nodes), dtype=np.float32)
+    nodes.foreach_get("dimensions", dimensions)
+    frame_index = FrameIndex(nodes)
+    offsets = np.array([frame_index.parent_offset(node) for node in nodes], dtype=np.float32).reshape(-1, 2)
+    positions = locations.reshape(-1, 2) + offsets
+    sizes = dimensions.reshape(-1, 2) / get_ui_scale()
+    bounds = np.column_stack((positions[:, 0], positions[:, 1] - sizes[:, 1], positions[:, 0] + sizes[:, 0], positions[:, 1]))
+
+    cache = {
+        "locations": locations,
+        "names": [node.name for node in nodes],
+        "eligible": np.fromiter((node.bl_static_type not in ('FRAME', 'REROUTE') for node in nodes), dtype=bool, count=len(nodes)),
+        "bounds": bounds,
+        "grid": build_node_grid(bounds, offscreen_grid_cell),
+        "rects": None,
+    }
+    offscreen_cache[key] = cache
+    return cache
+
+def get_offscreen_collapsed(tree):
+    # The collapsed names live on the tree itself, so undo steps and autosaves that contain
+    # collapsed nodes also know which of them the mode collapsed
+    names = tree.get(offscreen_collapsed_key, "")
+    return set(names.split("\n")) if names else set()
+
+def set_offscreen_collapsed(key, tree, collapsed):
+    if collapsed:
+        tree[offscreen_collapsed_key] = "\n".join(sorted(collapsed))
+        offscreen_collapsed_trees.add(key)
+    else:
+        if offscreen_collapsed_key in tree:
+            del tree[offscreen_collapsed_key]
+        offscreen_collapsed_trees.discard(key)
+
+def collapse_offscreen_nodes(key, tree, rects, margin):
+    nodes = tree.nodes
+    cache = get_offscreen_cache(key, nodes)
+    if cache["rects"] == rects:
+        return
+    cache["rects"] = rects
+
+    hide = np.zeros(len(nodes), dtype=bool)
+    nodes.foreach_get("hide", hide)
+    names = cache["names"]
+
+    # Nodes the user expanded themselves are no longer ours to restore
+    collapsed = get_offscreen_collapsed(tree)
+    collapsed.intersection_update(name for name, hidden in zip(names, hide) if hidden)
+    managed = np.fromiter((name in collapsed for name in names), dtype=bool, count=len(names))
+
+    # Expanding near the view and collapsing only further out keeps nodes at the edge from flickering
+    near = query_node_grid(cache["grid"], cache["bounds"], rects, margin, offscreen_grid_cell)
+    keep = query_node_grid(cache["grid"], cache["bounds"], rects, margin * 2, offscreen_grid_cell)
+    expand = managed & near
+    collapse = cache["eligible"] & ~hide & ~keep
+    if not expand.any() and not collapse.any():
+        return
+
+    hide[expand] = False
+    hide[collapse] = True
+    nodes.foreach_set("hide", hide)
+    collapsed.difference_update(names[i] for i in np.flatnonzero(expand))
+    collapsed.update(names[i] for i in np.flatnonzero(collapse))
+    set_offscreen_collapsed(key, tree, collapsed)
+
+def expand_collapsed_nodes(key):
+    tree = resolve_tree_owner(key)
+    offscreen_collapsed_trees.discard(key)
+    offscreen_cache.pop(key, None)
+    if tree is None:
+        return
+    collapsed = get_offscreen_collapsed(tree)
+    if not collapsed:
+        return
+
+    nodes = tree.nodes
+    hide = np.zeros(len(nodes), dtype=bool)
+    nodes.foreach_get("hide", hide)
+    expand = np.fromiter((node.name in collapsed for node in nodes), dtype=bool, count=len(nodes)) & hide
+    if expand.any():
+        hide[expand] = False
+        nodes.foreach_set("hide", hide)
+    set_offscreen_collapsed(key, tree, set())
+
+def update_offscreen_collapse():
+    margin = fetch_user_preferences().collapse_margin
+    rects = visible_node_rects()
+    for key, view_rects in rects.items():
+        tree = resolve_tree_owner(key)
+        if tree is not None:
+            collapse_offscreen_nodes(key, tree, view_rects, margin)
+
+    # Trees that are no longer shown in any editor get their nodes back
+    for key in tuple(offscreen_collapsed_trees):
+        if key not in rects:
+            expand_collapsed_nodes(key)
+    return offscreen_collapse_interval
+
+@persistent
+def offscreen_collapse_save_handler(dummy):
+    # Never save the collapse state of the mode into the file, the timer collapses again afterwards
+    for key in tuple(offscreen_collapsed_trees):
+        expand_collapsed_nodes(key)
+
+@persistent
+def offscreen_collapse_load_handler(dummy):
+    # Undo, redo and loading replace the trees, together with the collapsed names stored on them
+    offscreen_cache.clear()
+    offscreen_collapsed_trees.clear()
+    offscreen_collapsed_trees.update(key for key, tree in iter_data_trees() if offscreen_collapsed_key in tree)
+
+def set_auto_collapse_offscreen(enabled):
+    handlers = ((bpy.app.handlers.save_pre, offscreen_collapse_save_handler),
+        (bpy.app.handlers.load_post, offscreen_collapse_load_handler),
+        (bpy.app.handlers.undo_post, offscreen_collapse_load_handler),
+        (bpy.app.handlers.redo_post, offscreen_collapse_load_handler))
+    for handler_list, handler in handlers:
+        if enabled and handler not in handler_list:
+            handler_list.append(handler)
+        elif not enabled and handler in handler_list:
+            handler_list.remove(handler)
+
+    is_registered = bpy.app.timers.is_registered(update_offscreen_collapse)
+    if enabled and not is_registered:
+        bpy.app.timers.register(update_offscreen_collapse, first_interval=offscreen_collapse_interval)
+    elif not enabled:
+        if is_registered:
+            bpy.app.timers.unregister(update_offscreen_collapse)
+        offscreen_collapse_load_handler(None)
+        offscreen_collapse_save_handler(None)
+
+def update_auto_collapse_offscreen(self, context):
+    set_auto_collapse_offscreen(self.auto_collapse_offscreen)
+
+
+class NODEUTILS_OT_AUTO_LAYOUT(bpy.types.Operator, NodeUtilsBase):
+    bl_label = "Auto Layout"
+    bl_idname = "nd_utils.auto_layout"
+    bl_description = "Arranges selected nodes in layers from left to right following their links"
+
+    spacing_x: FloatProperty(name="Horizontal Spacing", default=80.0, min=0.0)
+    spacing_y: FloatProperty(name="Vertical Spacing", default=40.0, min=0.0)
+    sweeps: IntProperty(name="Sweeps", default=4, min=0, max=50,
+        description="Number of passes spent reducing link crossings")
+
+    def execute(self, context):
+        start_time = time.perf_counter()
+        nodes = get_nodes(context)
+        tree = nodes.id_data
+        selected = tuple((index, node) for index, node in enumerate(nodes) 
+            if node.select and node.bl_static_type != 'FRAME')
+        if len(selected) <= 1:
+            return {'CANCELLED'}
+
+        scale = get_ui_scale()
+        dimensions = [0.0] * (2*len(nodes))
+        nodes.foreach_get("dimensions", dimensions)
+
+        layout_id = {node.name: i for i, (_, node) in enumerate(selected)}
+        widths = [dimensions[2*index] / scale for index, _ in selected]
+        heights = [dimensions[2*index + 1] / scale for index, _ in selected]
+        groups = [node.parent.name if node.parent else None for _, node in selected]
+        edges = []
+        for link in tree.links:
+            from_id = layout_id.get(link.from_node.name)
+            to_id = layout_id.get(link.to_node.name)
+            if from_id is not None and to_id is not None:
+                edges.append((from_id, to_id))
+
+        positions = layered_layout(widths, heights, edges, groups, self.spacing_x, self.spacing_y, self.sweeps)
+
+        with deframe_nodes(node for _, node in selected):
+            locations = [0.0] * (2*len(nodes))
+            nodes.foreach_get("location", locations)
+            left = min(locations[2*index] for index, _ in selected)
+            top = max(locations[2*index + 1] for index, _ in selected)
+
+            for (index, _), (x, y) in zip(selected, positions):
+                locations[2*index] = left + x
+                locations[2*index + 1] = top + y
+            nodes.foreach_set("location", locations)
+
+        self.report({'INFO'}, f"Arranged {len(selected)} nodes in {(time.perf_counter() - start_time)*1000:.0f} ms")
+        return {'FINISHED'}
+
+
+def selection_boxes(nodes):
+    # Absolute top-left corners and sizes of the selected nodes as (n, 2) arrays
+    selected = tuple((index, node) for index, node in enumerate(nodes) 
+        if node.select and node.bl_static_type != 'FRAME')
+    if not selected:
+        return (), None, None, None
+
+    indices = np.fromiter((index for index, _ in selected), dtype=np.int64, count=len(selected))
+    locations = np.empty(2*len(nodes), dtype=np.float32)
+    dimensions = np.empty(2*len(nodes), dtype=np.float32)
+    nodes.foreach_get("location", locations)
+    nodes.foreach_get("dimensions", dimensions)
+
+    frame_index = FrameIndex(nodes)
+    offsets = np.array([frame_index.parent_offset(node) for _, node in selected], dtype=np.float32)
+    positions = locations.reshape(-1, 2)[indices] + offsets
+    sizes = dimensions.reshape(-1, 2)[indices] / get_ui_scale()
+    return tuple(node for _, node in selected), positions, sizes, offsets
+
+def write_moved_nodes(selected, positions, new_positions, offsets):
+    moved = np.flatnonzero(np.any(np.abs(new_positions - positions) > 0.01, axis=1))
+    relative = new_positions - offsets
+    for i in moved:
+        selected[i].location = relative[i]
+    return len(moved)
+
+
+class NODEUTILS_OT_ALIGN_NODES(bpy.types.Operator, NodeUtilsBase):
+    bl_label = "Align Nodes"
+    bl_idname = "nd_utils.align_nodes"
+    bl_description = "Aligns selected nodes along one of their edges or centers"
+
+    align_mode: EnumProperty(name='align_mode', items=(
+        ('LEFT', 'LEFT', ''), 
+        ('RIGHT', 'RIGHT', ''), 
+        ('CENTER_X', 'CENTER_X', ''), 
+        ('TOP', 'TOP', ''), 
+        ('BOTTOM', 'BOTTOM', ''), 
+        ('CENTER_Y', 'CENTER_Y', ''),))
+
+    @classmethod
+    def description(self, context, props):
+        if props.align_mode.startswith('CENTER'):
+            axis = 'horizontal' if props.align_mode == 'CENTER_X' else 'vertical'
+            return f"Aligns the {axis} centers of selected nodes"
+        return f"Aligns selected nodes by their {props.align_mode.lower()} edge"
+
+    def execute(self, context):
+        selected, positions, sizes, offsets = selection_boxes(get_nodes(context))
+        if len(selected) <= 1:
+            return {'CANCELLED'}
+
+        left, top = positions[:, 0], positions[:, 1]
+        width, height = sizes[:, 0], sizes[:, 1]
+        new_positions = positions.copy()
+
+        if self.align_mode == 'LEFT':
+            new_positions[:, 0] = left.min()
+        elif self.align_mode == 'RIGHT':
+            new_positions[:, 0] = (left + width).max() - width
+        elif self.align_mode == 'CENTER_X':
+            new_positions[:, 0] = 0.5*(left.min() + (left + width).max()) - 0.5*width
+        elif self.align_mode == 'TOP':
+            new_positions[:, 1] = top.max()
+        elif self.align_mode == 'BOTTOM':
+            new_positions[:, 1] = (top - height).min() + height
+        elif self.align_mode == 'CENTER_Y':
+            new_positions[:, 1] = 0.5*(top.max() + (top - height).min()) + 0.5*height
+
+        if write_moved_nodes(selected, positions, new_positions, offsets) == 0:
+            return {'CANCELLED'}
+        return {'FINISHED'}
+
+
+class NODEUTILS_OT_DISTRIBUTE_NODES(bpy.types.Operator, NodeUtilsBase):
+    bl_label = "Distribute Nodes"
+    bl_idname = "nd_utils.distribute_nodes"
+    bl_description = "Spaces selected nodes evenly"
+
+    distribute_mode: EnumProperty(name='distribute_mode', items=(
+        ('GAPS_X', 'GAPS_X', ''), 
+        ('GAPS_Y', 'GAPS_Y', ''), 
+        ('CENTERS_X', 'CENTERS_X', ''), 
+        ('CENTERS_Y', 'CENTERS_Y', ''), 
+        ('GRID', 'GRID', ''),))
+    spacing: FloatProperty(name="Spacing", default=40.0, min=0.0,
+        description="Gap between grid cells")
+
+    @classmethod
+    def description(self, context, props):
+        if props.distribute_mode == 'GRID':
+            return "Packs selected nodes into a grid, keeping their reading order"
+        kind, axis = props.distribute_mode.split('_')
+        direction = 'horizontally' if axis == 'X' else 'vertically'
+        return f"Distributes selected nodes {direction} with equal {kind.lower()}"
+
+    def execute(self, context):
+        selected, positions, sizes, offsets = selection_boxes(get_nodes(context))
+        if len(selected) <= 2 and self.distribute_mode != 'GRID' or len(selected) <= 1:
+            return {'CANCELLED'}
+
+        new_positions = positions.copy()
+        if self.distribute_mode == 'GRID':
+            # Reading order: top to bottom, then left to right
+            order = np.lexsort((positions[:, 0], -positions[:, 1]))
+            columns = int(np.ceil(np.sqrt(len(selected))))
+            cell = sizes.max(axis=0) + self.spacing
+            slots = np.arange(len(selected))
+            new_positions[order, 0] = positions[:, 0].min() + (slots % columns) * cell[0]
+            new_positions[order, 1] = positions[:, 1].max() - (slots // columns) * cell[1]
+        else:
+            kind, axis = self.distribute_mode.split('_')
+            axis = 0 if axis == 'X' else 1
+            # Work along an axis growing in reading direction, y is flipped so it grows downwards
+            sign = 1.0 if axis == 0 else -1.0
+            starts = sign * positions[:, axis]
+            lengths = sizes[:, axis]
+            order = np.argsort(starts, kind='stable')
+            starts, lengths = starts[order], lengths[order]
+
+            if kind == 'GAPS':
+                gap = ((starts + lengths).max() - starts[0] - lengths.sum()) / (len(selected) - 1)
+                new_starts = starts[0] + np.concatenate(((0.0,), np.cumsum(lengths[:-1] + gap)))
+            else:
+                centers = starts + 0.5*lengths
+                new_starts = np.linspace(centers[0], centers[-1], len(selected)) - 0.5*lengths
+            new_positions[order, axis] = sign * new_starts
+
+        if write_moved_nodes(selected, positions, new_positions, offsets) == 0:
+            return {'CANCELLED'}
+        return {'FINISHED'}
+
+
+search_index = {}
+search_dirty_trees = set()
+search_results = {}
+
+def index_tree(tree):
+    entries = []
+    for node in tree.nodes:
+        sockets = " ".join(socket.name for socket in itertools.chain(node.inputs, node.outputs) if socket.enabled)
+        fields = (node.name.lower(), node.label.lower(), node.bl_label.lower(), sockets.lower())
+        entries.append((node.name, node.label, node.bl_label, fields, " ".join(fields)))
+    return entries
+
+def refresh_search_index():
+    if not search_index:
+        search_dirty_trees.clear()
+        search_index.update((key, index_tree(tree)) for key, tree in iter_data_trees())
+        return
+
+    current_trees = dict(iter_data_trees())
+    for key in tuple(search_index):
+        if key not in current_trees:
+            del search_index[key]
+    for key, tree in current_trees.items():
+        if key not in search_index or key in search_dirty_trees:
+            search_index[key] = index_tree(tree)
+    search_dirty_trees.clear()
+
+def fuzzy_score(query, text):
+    if not text:
+        return 0.0
+    position = text.find(query)
+    if position == 0:
+        return 3.0 - len(text) / 1000
+    if position > 0:
+        return 2.0 - position / 100
+    
+    # Subsequence match, rewarding runs of consecutive characters and matches at word starts
+    score = 0.0
+    start = 0
+    previous = -2
+    for char in query:
+        position = text.find(char, start)
+        if position < 0:
+            return 0.0
+        if position == previous + 1:
+            score += 1.0
+        elif position == 0 or text[position - 1] in " _.-":
+            score += 0.8
+        else:
+            score += 0.2
+        previous = position
+        start = position + 1
+    return score / len(query)
+
+search_weights = (1.0, 1.0, 0.8, 0.5)
+
+def search_nodes(query, limit=50):
+    refresh_search_index()
+    query = query.lower().strip()
+    if not query:
+        return []
+
+    hits = []
+    for key, entries in search_index.items():
+        for node_name, label, type_label, fields, haystack in entries:
+            # Cheap subsequence check before scoring each field
+            chars = iter(haystack)
+            if not all(char in chars for char in query):
+                continue
+            score = max(weight * fuzzy_score(query, field) for weight, field in zip(search_weights, fields))
+            if score > 0:
+                hits.append((score, key, node_name, label, type_label))
+
+    hits.sort(key=lambda hit: hit[0], reverse=True)
+    return hits[:limit]
+
+def find_group_route(root, target):
+    # Breadth-first search for the chain of group nodes leading from root to target
+    queue = [(root, ())]
+    visited = {root.name_full}
+    for tree, route in queue:
+        if tree == target:
+            return route
+        for node in tree.nodes:
+            group_tree = getattr(node, "node_tree", None) if node.bl_static_type == 'GROUP' else None
+            if group_tree is not None and group_tree.name_full not in visited:
+                visited.add(group_tree.name_full)
+                queue.append((group_tree, route + (node,)))
+    return None
+
+@persistent
+def search_index_depsgraph_handler(scene, depsgraph):
+    if not search_index:
+        return
+    for update in depsgraph.updates:
+        key = tree_owner_key(update.id.original)
+        if key is not None:
+            search_dirty_trees.add(key)
+
+@persistent
+def search_index_load_handler(dummy):
+    search_index.clear()
+    search_dirty_trees.clear()
+    search_results.clear()
+
+
+class NODEUTILS_OT_SEARCH_NODES(bpy.types.Operator, NodeUtilsBase):
+    bl_label = "Search Nodes"
+    bl_idname = "nd_utils.search_nodes"
+    bl_description = "Finds a node by name, label, type or socket name in any node tree and jumps to it"
+    bl_options = {'REGISTER'}
+
+    def search_items(self, context, edit_text):
+        search_results.clear()
+        items = []
+        for score, key, node_name, label, type_label in search_nodes(edit_text):
+            display = f"{label or node_name}  [{type_label}]  {key[1]}"
+            if display in search_results:
+                display = f"{display} ({node_name})"
+            search_results[display] = (key, node_name)
+            items.append(display)
+        return items
+
+    query: StringProperty(name="", default="", search=search_items)
+
+    def draw(self, context):
+        self.layout.prop(self, "query", icon='VIEWZOOM')
+
+    def open_tree(self, space, tree):
+        if space.tree_type != tree.bl_idname:
+            space.tree_type = tree.bl_idname
+
+        root = space.path[0].node_tree if len(space.path) > 0 else None
+        route = find_group_route(root, tree) if root is not None else None
+        if route is not None:
+            space.path.start(root)
+            for group_node in route:
+                space.path.append(group_node.node_tree, node=group_node)
+        else:
+            space.pin = True
+            space.node_tree = tree
+
+    def execute(self, context):
+        hit = search_results.get(self.query)
+        if hit is None:
+            return {'CANCELLED'}
+        key, node_name = hit
+
+        tree = resolve_tree_owner(key)
+        node = tree.nodes.get(node_name) if tree is not None else None
+        if node is None:
+            self.report({'WARNING'}, f"Node '{node_name}' no longer exists")
+            return {'CANCELLED'}
+
+        self.open_tree(context.space_data, tree)
+        tree.nodes.foreach_set("select", [False] * len(tree.nodes))
+        node.select = True
+        tree.nodes.active = node
+        try:
+            bpy.ops.node.view_selected()
+        except RuntimeError:
+            pass
+        return {'FINISHED'}
+
+    def invoke(self, context, event):
+        self.query = ''
+        return context.window_manager.invoke_props_dialog(self)
+
+
+node_font_size = 11
+
+@lru_cache(maxsize=None)
+def text_width(text, ui_scale):
+    # Measured at the UI scale the editor draws with, returned in node width units
+    if bpy.app.version >= (4, 0, 0):
+        blf.size(0, node_font_size * ui_scale)
+    else:
+        blf.size(0, node_font_size, int(72 * ui_scale))
+    return blf.dimensions(0, text)[0] / ui_scale
+
+def content_width(node, ui_scale):
+    header_padding = 50
+    socket_padding = 30
+    value_padding = 60
+    dropdown_padding = 40
+
+    width = text_width(node.label or node.bl_label, ui_scale) + header_padding
+    for socket in node.outputs:
+        if socket.enabled and not socket.hide:
+            width = max(width, text_width(socket.name, ui_scale) + socket_padding)
+
+    for socket in node.inputs:
+        if not socket.enabled or socket.hide:
+            continue
+        has_inline_value = (not socket.is_linked and not socket.hide_value
+            and isinstance(getattr(socket, "default_value", None), (int, float)))
+        padding = socket_padding + value_padding if has_inline_value else socket_padding
+        width = max(width, text_width(socket.name, ui_scale) + padding)
+
+    for prop_id in node_property_ids(node):
+        prop = node.bl_rna.properties[prop_id]
+        if prop.type != 'ENUM' or prop.is_enum_flag:
+            continue
+        item = prop.enum_items.get(getattr(node, prop_id))
+        if item is not None:
+            width = max(width, text_width(item.name, ui_scale) + dropdown_padding)
+
+    return min(max(width, node.bl_width_min), node.bl_width_max)
+
+
+class NODEUTILS_OT_FIT_NODE_WIDTH(bpy.types.Operator, NodeUtilsBase):
+    bl_label = "Fit Node Width"
+    bl_idname = "nd_utils.fit_node_width"
+    bl_description = "Resizes selected nodes to the smallest width that fits their label, sockets and options"
+
+    normalize: EnumProperty(name="Normalize", items=(
+        ('NONE', "None", "Fit every node to its own content"),
+        ('COLUMN', "Per Column", "Give nodes in the same column the width of the widest one"),))
+    column_tolerance: FloatProperty(name="Column Tolerance", default=20.0, min=0.0,
+        description="Maximum horizontal distance between nodes considered to be in the same column")
+
+    def column_widths(self, selected, widths):
+        order = sorted(range(len(selected)), key=lambda i: selected[i][1].location.x)
+        columns = []
+        last_x = None
+        for i in order:
+            x = selected[i][1].location.x
+            if last_x is None or x - last_x > self.column_tolerance:
+                columns.append([])
+            columns[-1].append(i)
+            last_x = x
+
+        for column in columns:
+            column_width = max(widths[i] for i in column)
+            for i in column:
+                widths[i] = column_width
+        return widths
+
+    def execute(self, context):
+        nodes = get_nodes(context)
+        selected = tuple((index, node) for index, node in enumerate(nodes) 
+            if node.select and node.bl_static_type != 'FRAME' and node.bl_static_type != 'REROUTE')
+        if not selected:
+            return {'CANCELLED'}
+
+        ui_scale = get_ui_scale()
+        widths = [content_width(node, ui_scale) for _, node in selected]
+        if self.normalize == 'COLUMN':
+            widths = self.column_widths(selected, widths)
+
+        all_widths = [0.0] * len(nodes)
+        nodes.foreach_get("width", all_widths)
+        changed = False
+        for (index, _), width in zip(selected, widths):
+            width = round(width)
+            if all_widths[index] != width:
+                all_widths[index] = width
+                changed = True
+
+        if not changed:
+            return {'CANCELLED'}
+        nodes.foreach_set("width", all_widths)
+        return {'FINISHED'}
+
+
+def pack_sections(sections):
+    header = struct.pack(f"<{len(sections) + 1}I", len(sections), *(len(section) for section in sections))
+    return base64.b64encode(zlib.compress(header + b"".join(sections), 9)).decode('ascii')
+
+def unpack_sections(text):
+    data = zlib.decompress(base64.b64decode(text))
+    count = struct.unpack_from("<I", data)[0]
+    lengths = struct.unpack_from(f"<{count}I", data, 4)
+    sections = []
+    offset = 4 * (count + 1)
+    for length in lengths:
+        sections.append(data[offset:offset + length])
+        offset += length
+    return sections
+
+def pack_bits(values):
+    bits = bytearray((len(values) + 7) // 8)
+    for i, value in enumerate(values):
+        if value:
+            bits[i >> 3] |= 1 << (i & 7)
+    return bytes(bits)
+
+def unpack_bits(bits, count):
+    return [bool(bits[i >> 3] & (1 << (i & 7))) for i in range(count)]
+
+def typed_array(typecode, data):
+    values = array(typecode)
+    values.frombytes(data)
+    return values
+
+layout_store_key = "nd_utils_layouts"
+location_precision = 8
+
+def empty_layout_store():
+    # Snapshots listed in bases only store the nodes that differ from the snapshot they are based on
+    return {"ids": "", "snapshots": {}, "bases": {}}
+
+def layout_sidecar_path():
+    if not bpy.data.filepath:
+        return None
+    return Path(bpy.data.filepath).with_suffix(".nd_layouts.json")
+
+def read_layout_store(tree, storage):
+    if storage == 'TREE':
+        store = tree.get(layout_store_key)
+        store = store.to_dict() if store is not None else empty_layout_store()
+    else:
+        path = layout_sidecar_path()
+        if path is None or not path.exists():
+            return empty_layout_store()
+        store = json.loads(path.read_text(encoding='utf-8')).get(tree.name_full, empty_layout_store())
+    store.setdefault("bases", {})
+    return store
+
+def write_layout_store(tree, storage, store):
+    if storage == 'TREE':
+        tree[layout_store_key] = store
+        return
+
+    path = layout_sidecar_path()
+    data = json.loads(path.read_text(encoding='utf-8')) if path.exists() else {}
+    data[tree.name_full] = store
+    path.write_text(json.dumps(data), encoding='utf-8')
+
+def capture_layout(nodes, id_table):
+    # Node names are stored once per tree in id_table, layouts map indices into it to the node's state.
+    # Values go through the same types as the stored arrays, so they compare equal to decoded layouts.
+    count = len(nodes)
+    id_index = {name: i for i, name in enumerate(id_table)}
+    for node in nodes:
+        if node.name not in id_index:
+            id_index[node.name] = len(id_table)
+            id_table.append(node.name)
+
+    locations = [0.0] * (2*count)
+    widths = [0.0] * count
+    colors = [0.0] * (3*count)
+    hidden = [False] * count
+    custom_colors = [False] * count
+    nodes.foreach_get("location", locations)
+    nodes.foreach_get("width", widths)
+    nodes.foreach_get("color", colors)
+    nodes.foreach_get("hide", hidden)
+    nodes.foreach_get("use_custom_color", custom_colors)
+    widths = array('f', widths).tolist()
+    colors = array('f', colors).tolist()
+
+    layout = {}
+    for i, node in enumerate(nodes):
+        socket_states = []
+        for sockets in (node.inputs, node.outputs):
+            states = [False] * len(sockets)
+            sockets.foreach_get("hide", states)
+            socket_states.append(tuple(bool(state) for state in states))
+        layout[id_index[node.name]] = (
+            round(locations[2*i] * location_precision), round(locations[2*i + 1] * location_precision),
+            widths[i],
+            id_index[node.parent.name] if node.parent else -1,
+            bool(hidden[i]) | (bool(custom_colors[i]) << 1),
+            tuple(colors[3*i:3*i + 3]),
+            *socket_states,
+        )
+    return layout
+
+def encode_layout(layout, base=None):
+    # Only nodes that differ from the base layout are written. Ids are left out when they follow the
+    # order of the id table, and locations are stored as differences to the previous node, which are
+    # small and compress well for laid out trees.
+    ids = [node_id for node_id, state in layout.items() if base is None or base.get(node_id) != state]
+    removed = [] if base is None else [node_id for node_id in base if node_id not in layout]
+    implicit_ids = all(node_id == k for k, node_id in enumerate(ids))
+    states = [layout[node_id] for node_id in ids]
+    quantized = [value for state in states for value in state[:2]]
+
+    return pack_sections((
+        b"" if implicit_ids else array('I', ids).tobytes(),
+        array('i', (value - previous for value, previous in zip(quantized, [0, 0] + quantized))).tobytes(),
+        array('f', (state[2] for state in states)).tobytes(),
+        array('i', (state[3] for state in states)).tobytes(),
+        bytes(state[4] for state in states),
+        array('f', (value for state in states for value in state[5])).tobytes(),
+        array('H', (len(sockets) for state in states for sockets in state[6:])).tobytes(),
+        pack_bits([hidden for state in states for sockets in state[6:] for hidden in sockets]),
+        array('I', removed).tobytes(),
+    ))
+
+def decode_layout(payload, base=None):
+    ids, locations, widths, parents, flags, colors, socket_counts, socket_bits, removed = unpack_sections(payload)
+    locations = typed_array('i', locations)
+    ids = typed_array('I', ids) if ids else range(len(locations) // 2)
+    locations[0::2] = array('i', itertools.accumulate(locations[0::2]))
+    locations[1::2] = array('i', itertools.accumulate(locations[1::2]))
+    widths = typed_array('f', widths)
+    parents = typed_array('i', parents)
+    colors = typed_array('f', colors)
+    socket_counts = typed_array('H', socket_counts)
+    socket_hidden = unpack_bits(socket_bits, sum(socket_counts))
+
+    layout = dict(base) if base is not None else {}
+    for node_id in typed_array('I', removed):
+        layout.pop(node_id, None)
+    offset = 0
+    for k, node_id in enumerate(ids):
+        input_count, output_count = socket_counts[2*k:2*k + 2]
+        inputs = tuple(socket_hidden[offset:offset + input_count])
+        outputs = tuple(socket_hidden[offset + input_count:offset + input_count + output_count])
+        offset += input_count + output_count
+        layout[node_id] = (locations[2*k], locations[2*k + 1], widths[k], parents[k], flags[k], tuple(colors[3*k:3*k + 3]), inputs, outputs)
+    return layout
+
+def stored_layout(store, name):
+    base = store["bases"].get(name)
+    return decode_layout(store["snapshots"][name], decode_layout(store["snapshots"][base]) if base else None)
+
+def store_layout(store, name, layout):
+    # Snapshots are stored relative to the latest full snapshot, unless most of the nodes changed since.
+    # Bases are always full, so restoring never has to decode more than two snapshots.
+    remove_layout(store, name)
+    base = next((other for other in reversed(tuple(store["snapshots"])) if other not in store["bases"]), None)
+    if base is not None:
+        base_layout = stored_layout(store, base)
+        changed = sum(1 for node_id, state in layout.items() if base_layout.get(node_id) != state)
+        if changed <= len(layout) // 2:
+            store["snapshots"][name] = encode_layout(layout, base_layout)
+            store["bases"][name] = base
+            return
+    store["snapshots"][name] = encode_layout(layout)
+
+def remove_layout(store, name):
+    # Snapshots based on the removed one are stored in full before it goes away
+    if name not in store["snapshots"]:
+        return False
+    for other, base in tuple(store["bases"].items()):
+        if base == name:
+            store["snapshots"][other] = encode_layout(stored_layout(store, other))
+            del store["bases"][other]
+    del store["snapshots"][name]
+    store["bases"].pop(name, None)
+    return True
+
+def restore_layout(nodes, layout, id_table):
+    index = {node.name: i for i, node in enumerate(nodes)}
+    matches = [(state, index[id_table[node_id]]) for node_id, state in layout.items() if id_table[node_id] in index]
+
+    # Parents go first, since locations are stored relative to them
+    for state, i in matches:
+        node = nodes[i]
+        parent_name = id_table[state[3]] if state[3] >= 0 else None
+        if (node.parent.name if node.parent else None) != parent_name:
+            node.parent = nodes.get(parent_name) if parent_name is not None else None
+
+    count = len(nodes)
+    new_locations = [0.0] * (2*count)
+    new_widths = [0.0] * count
+    new_colors = [0.0] * (3*count)
+    new_hidden = [False] * count
+    new_custom_colors = [False] * count
+    nodes.foreach_get("location", new_locations)
+    nodes.foreach_get("width", new_widths)
+    nodes.foreach_get("color", new_colors)
+    nodes.foreach_get("hide", new_hidden)
+    nodes.foreach_get("use_custom_color", new_custom_colors)
+
+    for state, i in matches:
+        new_locations[2*i:2*i + 2] = (state[0] / location_precision, state[1] / location_precision)
+        new_widths[i] = state[2]
+        new_colors[3*i:3*i + 3] = state[5]
+        new_hidden[i] = bool(state[4] & 1)
+        new_custom_colors[i] = bool(state[4] & 2)
+
+    nodes.foreach_set("location", new_locations)
+    nodes.foreach_set("width", new_widths)
+    nodes.foreach_set("color", new_colors)
+    nodes.foreach_set("hide", new_hidden)
+    nodes.foreach_set("use_custom_color", new_custom_colors)
+
+    for state, i in matches:
+        node = nodes[i]
+        for sockets, states in zip((node.inputs, node.outputs), state[6:]):
+            if len(sockets) == len(states):
+                sockets.foreach_set("hide", states)
+
+    return len(matches), len(nodes) - len(matches)
+
+layout_enum_items = []
+
+def stored_layout_items(self, context):
+    layout_enum_items.clear()
+    tree = get_tree(context)
+    for storage, icon in (('TREE', 'NODETREE'), ('FILE', 'FILE')):
+        for name in read_layout_store(tree, storage)["snapshots"]:
+            layout_enum_items.append((f"{storage}:{name}", name, f"Stored in the {'node tree' if storage == 'TREE' else 'sidecar file'}", icon, len(layout_enum_items)))
+    if not layout_enum_items:
+        layout_enum_items.append(('NONE', "No Snapshots", "", 'INFO', 0))
+    return layout_enum_items
+
+
+class NODEUTILS_OT_SAVE_LAYOUT(bpy.types.Operator, NodeUtilsBase):
+    bl_label = "Save Layout Snapshot"
+    bl_idname = "nd_utils.save_layout"
+    bl_description = "Stores the location, width, parent, collapse, color and socket visibility of all nodes under a name"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    def execute(self, context):
+        props = context.window_manager.nd_utils_props
+        name = props.layout_snapshot_name.strip()
+        if not name:
+            self.report({'ERROR'}, "Snapshot name is empty")
+            return {'CANCELLED'}
+        if props.layout_storage == 'FILE' and layout_sidecar_path() is None:
+            self.report({'ERROR'}, "Save the blend file before using sidecar snapshots")
+            return {'CANCELLED'}
+
+        tree = get_tree(context)
+        store = read_layout_store(tree, props.layout_storage)
+        id_table = store["ids"].split("\n") if store["ids"] else []
+        store_layout(store, name, capture_layout(tree.nodes, id_table))
+        store["ids"] = "\n".join(id_table)
+        write_layout_store(tree, props.layout_storage, store)
+
+        self.report({'INFO'}, f"Saved layout '{name}' ({len(store['snapshots'][name]) / 1024:.1f} KB)")
+        return {'FINISHED'}
+
+
+class NODEUTILS_OT_RESTORE_LAYOUT(bpy.types.Operator, NodeUtilsBase):
+    bl_label = "Restore Layout Snapshot"
+    bl_idname = "nd_utils.restore_layout"
+    bl_description = "Restores a stored layout snapshot"
+    bl_property = "snapshot"
+
+    snapshot: EnumProperty(name="Snapshot", items=stored_layout_items)
+
+    def execute(self, context):
+        if self.snapshot == 'NONE':
+            return {'CANCELLED'}
+        storage, name = self.snapshot.split(":", 1)
+        tree = get_tree(context)
+        store = read_layout_store(tree, storage)
+        if name not in store["snapshots"]:
+            return {'CANCELLED'}
+
+        restored, missing = restore_layout(tree.nodes, stored_layout(store, name), store["ids"].split("\n"))
+        tree.update_tag()
+        context.area.tag_redraw()
+        self.report({'INFO'}, f"Restored layout '{name}' for {restored} nodes" + (f", {missing} nodes not in snapshot" if missing else ""))
+        return {'FINISHED'}
+
+    def invoke(self, context, event):
+        if self.properties.is_property_set("snapshot"):
+            return self.execute(context)
+        context.window_manager.invoke_search_popup(self)
+        return {'RUNNING_MODAL'}
+
+
+class NODEUTILS_OT_DELETE_LAYOUT(bpy.types.Operator, NodeUtilsBase):
+    bl_label = "Delete Layout Snapshot"
+    bl_idname = "nd_utils.delete_layout"
+    bl_description = "Deletes a stored layout snapshot"
+    bl_property = "snapshot"
+
+    snapshot: EnumProperty(name="Snapshot", items=stored_layout_items)
+
+    def execute(self, context):
+        if self.snapshot == 'NONE':
+            return {'CANCELLED'}
+        storage, name = self.snapshot.split(":", 1)
+        tree = get_tree(context)
+        store = read_layout_store(tree, storage)
+        if not remove_layout(store, name):
+            return {'CANCELLED'}
+        if not store["snapshots"]:
+            store = empty_layout_store()
+        write_layout_store(tree, storage, store)
+        return {'FINISHED'}
+
+    def invoke(self, context, event):
+        if self.properties.is_property_set("snapshot"):
+            return self.execute(context)
+        context.window_manager.invoke_search_popup(self)
+        return {'RUNNING_MODAL'}
+
+
+id_collections = (
+    (bpy.types.Object, 'objects'),
+    (bpy.types.Collection, 'collections'),
+    (bpy.types.Material, 'materials'),
+    (bpy.types.Image, 'images'),
+    (bpy.types.Texture, 'textures'),
+    (bpy.types.NodeTree, 'node_groups'),
+    (bpy.types.Mesh, 'meshes'),
+    (bpy.types.Text, 'texts'),
+)
+exported_property_types = ('BOOLEAN', 'INT', 'FLOAT', 'STRING', 'ENUM', 'POINTER')
+
+def json_value(value):
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    if isinstance(value, bpy.types.ID):
+        collection = next((collection for id_type, collection in id_collections if isinstance(value, id_type)), None)
+        return {"id": value.name, "collection": collection} if collection else None
+    if isinstance(value, bpy.types.bpy_struct):
+        return None
+    return [json_value(item) for item in value]
+
+def data_value(value, id_map=None):
+    # IDs created by the current import may have been renamed, so they are looked up by their exported name first
+    if isinstance(value, dict):
+        if id_map is not None and (value["collection"], value["id"]) in id_map:
+            return id_map[(value["collection"], value["id"])]
+        return getattr(bpy.data, value["collection"]).get(value["id"])
+    return value
+
+curve_mapping_settings = ("use_clip", "clip_min_x", "clip_min_y", "clip_max_x", "clip_max_y", "extend", "tone", "black_level", "white_level")
+zone_item_collections = ("state_items", "repeat_items")
+
+def color_ramp_data(ramp):
+    return {
+        "color_mode": ramp.color_mode,
+        "interpolation": ramp.interpolation,
+        "hue_interpolation": ramp.hue_interpolation,
+        "elements": [(element.position, tuple(element.color)) for element in ramp.elements],
+    }
+
+def restore_color_ramp(ramp, data):
+    ramp.color_mode = data["color_mode"]
+    ramp.interpolation = data["interpolation"]
+    ramp.hue_interpolation = data["hue_interpolation"]
+    # Elements are kept sorted by position, so all but the first are recreated instead of moved
+    elements = ramp.elements
+    while len(elements) > 1:
+        elements.remove(elements[-1])
+    (position, color), *rest = data["elements"]
+    elements[0].position = position
+    elements[0].color = color
+    for position, color in rest:
+        elements.new(position).color = color
+
+def curve_mapping_data(mapping):
+    return {
+        "settings": {name: json_value(getattr(mapping, name)) for name in curve_mapping_settings if hasattr(mapping, name)},
+        "curves": [[(tuple(point.location), point.handle_type) for point in curve.points] for curve in mapping.curves],
+    }
+
+def restore_curve_mapping(mapping, data):
+    for name, value in data["settings"].items():
+        setattr(mapping, name, value)
+    # Curves always keep at least two points, the remaining ones are recreated in order
+    for curve, points in zip(mapping.curves, data["curves"]):
+        while len(curve.points) > 2:
+            curve.points.remove(curve.points[-1])
+        for point, (location, handle_type) in zip(curve.points, points[:2]):
+            point.location = location
+            point.handle_type = handle_type
+        for location, handle_type in points[2:]:
+            curve.points.new(*location).handle_type = handle_type
+    mapping.update()
+
+struct_data_types = {
+    'ColorRamp': (color_ramp_data, restore_color_ramp),
+    'CurveMapping': (curve_mapping_data, restore_curve_mapping),
+}
+
+def struct_property_ids(node):
+    # Settings stored in nested structs, which can't be assigned like the other properties
+    properties = node.bl_rna.properties
+    return tuple(prop_id for prop_id in node_property_ids(node) 
+        if properties[prop_id].type == 'POINTER' and properties[prop_id].fixed_type.identifier in struct_data_types)
+
+def is_id_struct(struct):
+    while struct is not None:
+        if struct.identifier == 'ID':
+            return True
+        struct = struct.base
+    return False
+
+def exported_property_ids(node):
+    properties = node.bl_rna.properties
+    return tuple(prop_id for prop_id in node_property_ids(node) 
+        if not properties[prop_id].is_readonly and properties[prop_id].type in exported_property_types
+        and (properties[prop_id].type != 'POINTER' or is_id_struct(properties[prop_id].fixed_type)))
+
+def interface_sockets(tree):
+    if hasattr(tree, "interface"):
+        return [(item.in_out, item.name, item.socket_type) for item in tree.interface.items_tree if item.item_type == 'SOCKET']
+    return ([('INPUT', socket.name, socket.bl_socket_idname) for socket in tree.inputs] 
+        + [('OUTPUT', socket.name, socket.bl_socket_idname) for socket in tree.outputs])
+
+def create_interface_sockets(tree, sockets):
+    # Sockets that already match are kept instead of being recreated, so their identifiers and the
+    # links to instances of the group in other trees survive
+    if hasattr(tree, "interface"):
+        interface = tree.interface
+        existing = [item for item in interface.items_tree if item.item_type == 'SOCKET']
+        kept = []
+        for in_out, name, socket_type in sockets:
+            item = next((item for item in existing if item not in kept
+                and (item.in_out, item.name, item.socket_type) == (in_out, name, socket_type)), None)
+            kept.append(item if item is not None else interface.new_socket(name, in_out=in_out, socket_type=socket_type))
+        for item in existing:
+            if item not in kept:
+                interface.remove(item)
+        for position, item in enumerate(kept):
+            interface.move(item, position)
+        return
+
+    for collection, in_out in ((tree.inputs, 'INPUT'), (tree.outputs, 'OUTPUT')):
+        existing = list(collection)
+        kept = []
+        for _, name, socket_type in (socket for socket in sockets if socket[0] == in_out):
+            socket = next((socket for socket in existing if socket not in kept
+                and (socket.name, socket.bl_socket_idname) == (name, socket_type)), None)
+            kept.append(socket if socket is not None else collection.new(socket_type, name))
+        for socket in existing:
+            if socket not in kept:
+                collection.remove(socket)
+        for position, socket in enumerate(kept):
+            collection.move(next(i for i, other in enumerate(collection) if other == socket), position)
+
+def socket_reference(socket, sockets):
+    return (socket.identifier, next(i for i, other in enumerate(sockets) if other == socket))
+
+def find_socket(sockets, reference):
+    identifier, index = reference
+    for socket in sockets:
+        if socket.identifier == identifier:
+            return socket
+    return sockets[index] if index < len(sockets) else None
+
+def iter_tree_records(key, tree):
+    yield {"type": "tree", "owner": key, "name": tree.name, "bl_idname": tree.bl_idname}
+    if key[0] == 'node_groups':
+        yield {"type": "interface", "sockets": interface_sockets(tree)}
+
+    for node in tree.nodes:
+        record = {
+            "type": "node",
+            "name": node.name,
+            "bl_idname": node.bl_idname,
+            "label": node.label,
+            "parent": node.parent.name if node.parent else None,
+            "location": tuple(node.location),
+            "width": node.width,
+            "hide": node.hide,
+            "mute": node.mute,
+            "use_custom_color": node.use_custom_color,
+            "color": tuple(node.color),
+            "properties": {prop_id: json_value(getattr(node, prop_id)) for prop_id in exported_property_ids(node)},
+            "structs": {prop_id: struct_data_types[node.bl_rna.properties[prop_id].fixed_type.identifier][0](getattr(node, prop_id))
+                for prop_id in struct_property_ids(node)},
+            "inputs": [(socket.identifier, index, json_value(socket.default_value)) 
+                for index, socket in enumerate(node.inputs) if hasattr(socket, "default_value")],
+            "hidden_sockets": [(side, socket.identifier, index) for side in ('inputs', 'outputs')
+                for index, socket in enumerate(getattr(node, side)) if socket.hide],
+        }
+        # Zones only work when the input node is paired and the output node has the same items
+        paired_output = getattr(node, "paired_output", None)
+        if paired_output is not None:
+            record["paired_output"] = paired_output.name
+        for collection in zone_item_collections:
+            if hasattr(node, collection):
+                record[collection] = [(item.socket_type, item.name, getattr(item, "attribute_domain", None)) for item in getattr(node, collection)]
+        yield record
+
+    # Links are created in this order, which keeps the order of links into multi-input sockets
+    for link in sorted(tree.links, key=lambda link: link.multi_input_sort_id if link.to_socket.is_multi_input else 0):
+        yield {
+            "type": "link",
+            "from": (link.from_node.name, *socket_reference(link.from_socket, link.from_node.outputs)),
+            "to": (link.to_node.name, *socket_reference(link.to_socket, link.to_node.inputs)),
+            "muted": link.is_muted,
+        }
+
+def group_dependency_order(trees):
+    # Node groups have to be written before the trees that use them, so the importer can link to them
+    order = []
+    visited = set()
+    def visit(key, tree):
+        if key in visited:
+            return
+        visited.add(key)
+        for node in tree.nodes:
+            group_tree = getattr(node, "node_tree", None) if node.bl_static_type == 'GROUP' else None
+            group_key = tree_owner_key(group_tree) if group_tree is not None else None
+            if group_key is not None:
+                visit(group_key, group_tree)
+        order.append((key, tree))
+    for key, tree in trees:
+        visit(key, tree)
+    return order
+
+def open_tree_stream(filepath, mode):
+    if filepath.endswith(".gz"):
+        return gzip.open(filepath, mode + 't', encoding='utf-8')
+    return open(filepath, mode, encoding='utf-8')
+
+def get_import_tree(record, replace_existing):
+    # Returns the ID owning the tree and the tree itself, which are the same for node groups
+    collection, name = record["owner"]
+    if collection == 'node_groups':
+        tree = bpy.data.node_groups.get(name) if replace_existing else None
+        if tree is None:
+            tree = bpy.data.node_groups.new(name, record["bl_idname"])
+        return tree, tree
+
+    owner = getattr(bpy.data, collection).get(name) if replace_existing else None
+    if owner is None:
+        if collection not in ('materials', 'worlds'):
+            return None, None
+        owner = getattr(bpy.data, collection).new(name)
+    owner.use_nodes = True
+    return owner, owner.node_tree
+
+def build_tree(tree, records, id_map=None):
+    # Returns the number of nodes created and the properties that could not be restored
+    tree.nodes.clear()
+    nodes = tree.nodes
+    node_records = [record for record in records if record["type"] == "node"]
+    created = {}
+    failed = []
+
+    def restore(record, prop_id, apply):
+        try:
+            apply()
+        except (AttributeError, TypeError, ValueError, KeyError, RuntimeError):
+            failed.append(f"{record['name']}.{prop_id}")
+
+    for record in node_records:
+        node = nodes.new(record["bl_idname"])
+        node.name = record["name"]
+        created[record["name"]] = node
+        for prop_id, value in record["properties"].items():
+            resolved = data_value(value, id_map)
+            if isinstance(value, dict) and resolved is None:
+                failed.append(f"{record['name']}.{prop_id}")
+                continue
+            restore(record, prop_id, lambda: setattr(node, prop_id, resolved))
+        for prop_id, data in record.get("structs", {}).items():
+            restore(record, prop_id, lambda: struct_data_types[node.bl_rna.properties[prop_id].fixed_type.identifier][1](getattr(node, prop_id), data))
+
+    # Zone items define the sockets of both zone nodes, so they go before socket values and links
+    for record in node_records:
+        node = created[record["name"]]
+        if record.get("paired_output") in created:
+            restore(record, "paired_output", lambda: node.pair_with_output(created[record["paired_output"]]))
+        for collection in zone_item_collections:
+            if collection in record:
+                def create_items():
+                    items = getattr(node, collection)
+                    items.clear()
+                    for socket_type, name, attribute_domain in record[collection]:
+                        item = items.new(socket_type, name)
+                        if attribute_domain is not None:
+                            item.attribute_domain = attribute_domain
+                restore(record, collection, create_items)
+
+    for record in node_records:
+        node = created[record["name"]]
+        if record["parent"] in created:
+            node.parent = created[record["parent"]]
+        node.label = record["label"]
+        node.location = record["location"]
+        node.width = record["width"]
+        node.hide = record["hide"]
+        node.mute = record["mute"]
+        node.use_custom_color = record["use_custom_color"]
+        node.color = record["color"]
+        for identifier, index, value in record["inputs"]:
+            socket = find_socket(node.inputs, (identifier, index))
+            if socket is not None and value is not None:
+                restore(record, identifier, lambda: setattr(socket, "default_value", data_value(value, id_map)))
+        for side, identifier, index in record.get("hidden_sockets", ()):
+            socket = find_socket(getattr(node, side), (identifier, index))
+            if socket is not None:
+                socket.hide = True
+
+    for record in records:
+        if record["type"] != "link":
+            continue
+        from_name, *from_reference = record["from"]
+        to_name, *to_reference = record["to"]
+        if from_name not in created or to_name not in created:
+            continue
+        from_socket = find_socket(created[from_name].outputs, from_reference)
+        to_socket = find_socket(created[to_name].inputs, to_reference)
+        if from_socket is not None and to_socket is not None:
+            tree.links.new(from_socket, to_socket).is_muted = record.get("muted", False)
+    return len(node_records), failed
+
+
+class NODEUTILS_OT_EXPORT_TREES(bpy.types.Operator, NodeUtilsBase, ExportHelper):
+    bl_label = "Export Node Trees"
+    bl_idname = "nd_utils.export_trees"
+    bl_description = "Streams node trees, their nodes, links, socket defaults and layout to a JSON Lines file"
+    bl_options = {'REGISTER'}
+
+    filename_ext = ".jsonl"
+    filter_glob: StringProperty(default="*.jsonl;*.jsonl.gz", options={'HIDDEN'})
+    scope: EnumProperty(name="Scope", items=(
+        ('ACTIVE', "Current Tree", "Export the tree shown in the editor and the node groups it uses"),
+        ('GROUPS', "Node Groups", "Export every local node group"),
+        ('ALL', "All Trees", "Export node groups and all material, world, scene, light and texture trees"),))
+    compress: BoolProperty(name="Compress", default=False,
+        description="Write a gzip compressed stream")
+
+    def check(self, context):
+        filepath = self.filepath
+        for extension in (".jsonl.gz", ".jsonl"):
+            if filepath.endswith(extension):
+                filepath = filepath[:-len(extension)]
+                break
+        filepath += ".jsonl.gz" if self.compress else ".jsonl"
+        changed = filepath != self.filepath
+        self.filepath = filepath
+        return changed
+
+    def execute(self, context):
+        self.check(context)
+        if self.scope == 'ACTIVE':
+            tree = get_tree(context)
+            key = next((key for key, other in iter_data_trees() if other == tree), None)
+            if key is None:
+                self.report({'ERROR'}, "Linked node trees can't be exported")
+                return {'CANCELLED'}
+            trees = group_dependency_order(((key, tree),))
+        elif self.scope == 'GROUPS':
+            trees = group_dependency_order(key_tree for key_tree in iter_data_trees() if key_tree[0][0] == 'node_groups')
+        else:
+            trees = group_dependency_order(iter_data_trees())
+
+        record_count = 0
+        with open_tree_stream(self.filepath, 'w') as file:
+            for key, tree in trees:
+                for record in iter_tree_records(key, tree):
+                    file.write(json.dumps(record, separators=(',', ':')))
+                    file.write("\n")
+                    record_count += 1
+
+        self.report({'INFO'}, f"Exported {len(trees)} trees ({record_count} records) to {self.filepath}")
+        return {'FINISHED'}
+
+
+class NODEUTILS_OT_IMPORT_TREES(bpy.types.Operator, NodeUtilsBase, ImportHelper):
+    bl_label = "Import Node Trees"
+    bl_idname = "nd_utils.import_trees"
+    bl_description = "Recreates node trees from a JSON Lines file written by Export Node Trees"
+
+    filename_ext = ".jsonl"
+    filter_glob: StringProperty(default="*.jsonl;*.jsonl.gz", options={'HIDDEN'})
+    replace_existing: BoolProperty(name="Replace Existing", default=True,
+        description="Rebuild trees that already exist instead of creating new ones")
+
+    def execute(self, context):
+        tree_count = 0
+        node_count = 0
+        skipped = 0
+        failed = []
+        # Exported name to the ID created for it, groups are written before the trees using them
+        id_map = {}
+
+        def flush(header, records):
+            nonlocal tree_count, node_count, skipped
+            owner, tree = get_import_tree(header, self.replace_existing)
+            if tree is None:
+                skipped += 1
+                return
+            id_map[tuple(header["owner"])] = owner
+            interface = next((record for record in records if record["type"] == "interface"), None)
+            if interface is not None:
+                create_interface_sockets(tree, interface["sockets"])
+            created, tree_failed = build_tree(tree, records, id_map)
+            node_count += created
+            failed.extend(f"{tree.name}: {prop}" for prop in tree_failed)
+            tree_count += 1
+
+        # Only one tree's records are held in memory at a time
+        header = None
+        records = []
+        with open_tree_stream(self.filepath, 'r') as file:
+            for line in file:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if record["type"] == "tree":
+                    if header is not None:
+                        flush(header, records)
+                    header = record
+                    records = []
+                else:
+                    records.append(record)
+        if header is not None:
+            flush(header, records)
+
+        self.report({'INFO'}, f"Imported {tree_count} trees with {node_count} nodes" + (f", skipped {skipped}" if skipped else ""))
+        if failed:
+            self.report({'WARNING'}, f"{len(failed)} properties could not be restored: {', '.join(failed[:5])}" + (", ..." if len(failed) > 5 else ""))
+        return {'FINISHED'}
+
+
+selection_store_key = "nd_utils_selection_sets"
+selection_history = {}
+selection_history_size = 32
+
+def selection_flags(nodes):
+    flags = np.zeros(len(nodes), dtype=bool)
+    nodes.foreach_get("select", flags)
+    return flags
+
+def selection_to_bits(nodes, flags, id_table, id_index):
+    # Bit i of the result is set when the node with identity i in id_table is selected
+    for node in nodes:
+        if node.name not in id_index:
+            id_index[node.name] = len(id_table)
+            id_table.append(node.name)
+    bits = np.zeros(len(id_table), dtype=bool)
+    bits[[id_index[node.name] for node in nodes]] = flags
+    return np.packbits(bits, bitorder='little').tobytes()
+
+def bits_to_selection(nodes, bits, id_index):
+    bits = np.unpackbits(np.frombuffer(bits, dtype=np.uint8), bitorder='little')
+    flags = np.zeros(len(nodes), dtype=bool)
+    for i, node in enumerate(nodes):
+        node_id = id_index.get(node.name)
+        if node_id is not None and node_id < len(bits):
+            flags[i] = bits[node_id]
+    return flags
+
+def combine_selection_flags(selection_mode, selected, target):
+    if selection_mode == 'New':
+        return target
+    elif selection_mode == 'Add':
+        return selected | target
+    elif selection_mode == 'Subtract':
+        return selected & ~target
+    elif selection_mode == 'Intersection':
+        return selected & target
+    elif selection_mode == 'Invert':
+        return selected ^ target
+    return None
+
+def get_selection_history(tree):
+    # Kept outside of the blend data so it is unaffected by undo
+    history = selection_history.get(tree.as_pointer())
+    if history is None:
+        history = {"ids": [], "id_index": {}, "entries": deque(maxlen=selection_history_size), "cursor": -1}
+        selection_history[tree.as_pointer()] = history
+    return history
+
+def record_selection(tree):
+    history = get_selection_history(tree)
+    nodes = tree.nodes
+    bits = selection_to_bits(nodes, selection_flags(nodes), history["ids"], history["id_index"])
+    entries = history["entries"]
+    while len(entries) > history["cursor"] + 1:
+        entries.pop()
+    if entries and entries[-1] == bits:
+        return
+    entries.append(bits)
+    history["cursor"] = len(entries) - 1
+
+def read_selection_store(tree):
+    store = tree.get(selection_store_key)
+    return store.to_dict() if store is not None else {"ids": "", "sets": {}}
+
+@persistent
+def selection_history_load_handler(dummy):
+    selection_history.clear()
+
+selection_set_enum_items = []
+
+def stored_selection_set_items(self, context):
+    selection_set_enum_items.clear()
+    for name in read_selection_store(get_tree(context))["sets"]:
+        selection_set_enum_items.append((name, name, "", 'RESTRICT_SELECT_OFF', len(selection_set_enum_items)))
+    if not selection_set_enum_items:
+        selection_set_enum_items.append(('NONE', "No Selection Sets", "", 'INFO', 0))
+    return selection_set_enum_items
+
+
+class NODEUTILS_OT_SAVE_SELECTION_SET(bpy.types.Operator, NodeUtilsBase):
+    bl_label = "Save Selection Set"
+    bl_idname = "nd_utils.save_selection_set"
+    bl_description = "Stores the current selection under a name"
+
+    def execute(self, context):
+        name = context.window_manager.nd_utils_props.selection_set_name.strip()
+        if not name:
+            self.report({'ERROR'}, "Selection set name is empty")
+            return {'CANCELLED'}
+
+        tree = get_tree(context)
+        nodes = tree.nodes
+        store = read_selection_store(tree)
+        id_table = store["ids"].split("\n") if store["ids"] else []
+        id_index = {node_name: i for i, node_name in enumerate(id_table)}
+        bits = selection_to_bits(nodes, selection_flags(nodes), id_table, id_index)
+        store["sets"][name] = pack_sections((bits,))
+        store["ids"] = "\n".join(id_table)
+        tree[selection_store_key] = store
+        record_selection(tree)
+        return {'FINISHED'}
+
+
+class NODEUTILS_OT_RECALL_SELECTION_SET(bpy.types.Operator, NodeUtilsBase):
+    bl_label = "Recall Selection Set"
+    bl_idname = "nd_utils.recall_selection_set"
+    bl_description = "Combines a stored selection set with the current selection using the current selection mode"
+    bl_property = "selection_set"
+
+    selection_set: EnumProperty(name="Selection Set", items=stored_selection_set_items)
+
+    def execute(self, context):
+        tree = get_tree(context)
+        store = read_selection_store(tree)
+        if self.selection_set not in store["sets"]:
+            return {'CANCELLED'}
+
+        nodes = tree.nodes
+        id_index = {node_name: i for i, node_name in enumerate(store["ids"].split("\n"))}
+        target = bits_to_selection(nodes, unpack_sections(store["sets"][self.selection_set])[0], id_index)
+        selected = selection_flags(nodes)
+        selection_mode = context.window_manager.nd_utils_props.selection_mode
+        new_selection = combine_selection_flags(selection_mode, selected, target)
+        if new_selection is None or np.array_equal(new_selection, selected):
+            return {'CANCELLED'}
+
+        record_selection(tree)
+        nodes.foreach_set("select", new_selection)
+        record_selection(tree)
+        context.area.tag_redraw()
+        return {'FINISHED'}
+
+    def invoke(self, context, event):
+        if self.properties.is_property_set("selection_set"):
+            return self.execute(context)
+        context.window_manager.invoke_search_popup(self)
+        return {'RUNNING_MODAL'}
+
+
+class NODEUTILS_OT_DELETE_SELECTION_SET(bpy.types.Operator, NodeUtilsBase):
+    bl_label = "Delete Selection Set"
+    bl_idname = "nd_utils.delete_selection_set"
+    bl_description = "Deletes a stored selection set"
+    bl_property = "selection_set"
+
+    selection_set: EnumProperty(name="Selection Set", items=stored_selection_set_items)
+
+    def execute(self, context):
+        tree = get_tree(context)
+        store = read_selection_store(tree)
+        if store["sets"].pop(self.selection_set, None) is None:
+            return {'CANCELLED'}
+        if store["sets"]:
+            tree[selection_store_key] = store
+        else:
+            del tree[selection_store_key]
+        return {'FINISHED'}
+
+    def invoke(self, context, event):
+        if self.properties.is_property_set("selection_set"):
+            return self.execute(context)
+        context.window_manager.invoke_search_popup(self)
+        return {'RUNNING_MODAL'}
+
+
+class NODEUTILS_OT_SELECTION_HISTORY(bpy.types.Operator, NodeUtilsBase):
+    bl_label = "Selection History"
+    bl_idname = "nd_utils.selection_history"
+    bl_description = "Steps through previous selections, independent of undo"
+    bl_options = {'REGISTER'}
+
+    direction: EnumProperty(name='direction', items=(
+        ('BACK', 'BACK', ''), ('FORWARD', 'FORWARD', ''),))
+
+    @classmethod
+    def description(self, context, props):
+        return "Restores the previous selection" if props.direction == 'BACK' else "Restores the next selection"
+
+    def execute(self, context):
+        tree = get_tree(context)
+        nodes = tree.nodes
+        history = get_selection_history(tree)
+        entries = history["entries"]
+        current = selection_to_bits(nodes, selection_flags(nodes), history["ids"], history["id_index"])
+
+        if self.direction == 'BACK':
+            # Keep the current selection reachable with Forward if it was never recorded
+            if history["cursor"] == len(entries) - 1 and (not entries or entries[-1] != current):
+                record_selection(tree)
+            cursor = history["cursor"] - 1
+        else:
+            cursor = history["cursor"] + 1
+
+        if not 0 <= cursor < len(entries):
+            return {'CANCELLED'}
+
+        history["cursor"] = cursor
+        nodes.foreach_set("select", bits_to_selection(nodes, entries[cursor], history["id_index"]))
+        context.area.tag_redraw()
+        return {'FINISHED'}
+
+
+class NODEUTILS_OT_COPY_FROM_ACTIVE(bpy.types.Operator, NodeUtilsBase):
+    bl_label = "Copy from Active"
+    bl_idname = "nd_utils.copy_from_active"
+    bl_description = "Copies the chosen attributes of the active node to all selected nodes"
+
+    attributes: EnumProperty(name="Attributes", options={'ENUM_FLAG'}, default={'WIDTH', 'COLOR'}, items=(
+        ('WIDTH', "Width", "Node width"),
+        ('COLOR', "Color", "Custom color and whether it is used"),
+        ('LABEL', "Label", "Node label"),
+        ('COLLAPSED', "Collapsed", "Whether the node is collapsed"),
+        ('OPTIONS', "Options", "Whether the node shows its options"),
+        ('SOCKETS', "Socket Visibility", "Hidden sockets, matched by identifier on nodes of the same type"),
+        ('CUSTOM_PROPS', "Custom Properties", "Custom properties stored on the node"),))
+
+    # Attribute, number of values per node, numpy dtype
+    bulk_attributes = {
+        'WIDTH': (("width", 1, np.float32),),
+        'COLOR': (("use_custom_color", 1, bool), ("color", 3, np.float32)),
+        'COLLAPSED': (("hide", 1, bool),),
+        'OPTIONS': (("show_options", 1, bool),),
+    }
+
+    def draw(self, context):
+        self.layout.column().prop(self, "attributes")
+
+    def copy_bulk(self, nodes, active, targets):
+        changed = 0
+        for attribute in self.attributes:
+            for prop_name, size, dtype in self.bulk_attributes.get(attribute, ()):
+                values = np.empty(len(nodes) * size, dtype=dtype)
+                nodes.foreach_get(prop_name, values)
+                values = values.reshape(-1, size)
+                source = np.asarray(getattr(active, prop_name), dtype=dtype).reshape(size)
+                differs = targets[np.any(values[targets] != source, axis=1)]
+                if len(differs) == 0:
+                    continue
+                values[differs] = source
+                nodes.foreach_set(prop_name, values.ravel())
+                changed += len(differs)
+        return changed
+
+    def copy_sockets(self, active, target):
+        changed = 0
+        for active_sockets, target_sockets in ((active.inputs, target.inputs), (active.outputs, target.outputs)):
+            hidden = {socket.identifier: socket.hide for socket in active_sockets}
+            for socket in target_sockets:
+                hide = hidden.get(socket.identifier)
+                if hide is not None and socket.hide != hide:
+                    socket.hide = hide
+                    changed += 1
+        return changed
+
+    def copy_custom_props(self, active, target):
+        changed = 0
+        for key in active.keys():
+            value = active[key]
+            value = value.to_dict() if hasattr(value, "to_dict") else value
+            current = target.get(key)
+            current = current.to_dict() if hasattr(current, "to_dict") else current
+            if current != value:
+                target[key] = value
+                changed += 1
+        return changed
+
+    def execute(self, context):
+        nodes = get_nodes(context)
+        active = nodes.active
+        if active is None or not self.attributes:
+            return {'CANCELLED'}
+
+        targets = np.fromiter((i for i, node in enumerate(nodes) if node.select and node != active), dtype=np.int64)
+        if len(targets) == 0:
+            return {'CANCELLED'}
+
+        changed = self.copy_bulk(nodes, active, targets)
+        target_nodes = tuple(nodes[int(i)] for i in targets)
+        if 'LABEL' in self.attributes:
+            for node in target_nodes:
+                if node.label != active.label:
+                    node.label = active.label
+                    changed += 1
+        if 'SOCKETS' in self.attributes:
+            for node in target_nodes:
+                if node.bl_idname == active.bl_idname:
+                    changed += self.copy_sockets(active, node)
+        if 'CUSTOM_PROPS' in self.attributes:
+            for node in target_nodes:
+                changed += self.copy_custom_props(active, node)
+
+        if changed == 0:
+            return {'CANCELLED'}
+        return {'FINISHED'}
+
+    def invoke(self, context, event):
+        return context.window_manager.invoke_props_popup(self, event)
+
+
+# Operators that clean up a whole tree and whose default settings are safe to repeat on any tree.
+# Operators that need a value from the user (labels, widths, alignment modes) are deliberately left out.
+context_operators = (
+    NODEUTILS_OT_STRAIGHTEN_REROUTES,
+    NODEUTILS_OT_COLLAPSE_REROUTES,
+    NODEUTILS_OT_MERGE_DUPLICATE_NODES,
+    NODEUTILS_OT_SHRINK_FRAMES,
+    NODEUTILS_OT_RECENTER_NODES,
+    NODEUTILS_OT_RESTORE_PERFORMANCE_MODE,
+)
+context_operator_items = [(cls.bl_idname, cls.bl_label, cls.bl_description, i) for i, cls in enumerate(context_operators)]
+
+
+class NODEUTILS_OT_RUN_ACROSS_TREES(bpy.types.Operator, NodeUtilsBase):
+    bl_label = "Run Across Trees"
+    bl_idname = "nd_utils.run_across_trees"
+    bl_description = "Runs an operator on the trees of all open node editors or on every group level of the current one, as a single undo step"
+    bl_property = "operator"
+
+    operator: EnumProperty(name="Operator", items=context_operator_items)
+    scope: EnumProperty(name="Scope", items=(
+        ('EDITORS', "All Editors", "The trees shown in every open node editor"),
+        ('PATH', "All Group Levels", "Every tree on the group path of the current editor, from the top level down"),))
+
+    def run(self, operator, results):
+        # Undo is disabled for each call, the undo step of this operator covers all of them
+        try:
+            results.update(operator('EXEC_DEFAULT', False))
+        except RuntimeError:
+            results['CANCELLED'] += 1
+
+    def execute(self, context):
+        category, name = self.operator.split(".", 1)
+        operator = getattr(getattr(bpy.ops, category), name)
+        results = Counter()
+        visited = set()
+
+        if self.scope == 'PATH':
+            for tree in space_tree_path(context.space_data):
+                if tree.as_pointer() not in visited:
+                    visited.add(tree.as_pointer())
+                    with override_tree(tree):
+                        self.run(operator, results)
+        else:
+            for window in context.window_manager.windows:
+                for area in window.screen.areas:
+                    if area.type != 'NODE_EDITOR':
+                        continue
+                    tree = area.spaces.active.edit_tree
+                    region = next((region for region in area.regions if region.type == 'WINDOW'), None)
+                    if tree is None or region is None or tree.as_pointer() in visited:
+                        continue
+                    visited.add(tree.as_pointer())
+                    with context.temp_override(window=window, area=area, region=region):
+                        self.run(operator, results)
+
+        if results['FINISHED'] == 0:
+            return {'CANCELLED'}
+        self.report({'INFO'}, f"Ran {self.operator} on {results['FINISHED']} of {len(visited)} trees")
+        return {'FINISHED'}
+
+    def invoke(self, context, event):
+        if self.properties.is_property_set("operator"):
+            return self.execute(context)
+        context.window_manager.invoke_search_popup(self)
+        return {'RUNNING_MODAL'}
+
+
+def refresh_ui(self, context):
+    for region in context.area.regions:
+        if region.type == "UI":
+            region.tag_redraw()
+    return None    
+
+class NodetreeUtilsProperties(bpy.types.PropertyGroup):
+    selection_mode: EnumProperty(name='Selection Mode', 
+        description='Toggles what mode of selection is used.',
+        default='New',
+        update=refresh_ui, 
+        items=(
+        ('New', 'New', 'Creates a new selection out of the specified nodes', 'SELECT_SET', 0),
+        ('Add', 'Add', 'Adds specified nodes from current selection', 'SELECT_EXTEND', 1), 
+        ('Subtract', 'Subtract', 'Removes specified nodes from current selection', 'SELECT_SUBTRACT', 2), 
+        ('Intersection', 'Intersection', 'Only selects nodes shared between specified nodes and current selection','SELECT_INTERSECT', 3),
+        ('Invert', 'Invert', 'Flip the selection state of the specified nodes','SELECT_DIFFERENCE', 4),
+        ))
+
+    selection_set_name: StringProperty(name='Selection Set Name', default='Selection',
+        description='Name used when saving a selection set')
+
+    layout_snapshot_name: StringProperty(name='Snapshot Name', default='Layout',
+        description='Name used when saving a layout snapshot')
+
+    layout_storage: EnumProperty(name='Storage', 
+        description='Where layout snapshots are saved',
+        default='TREE',
+        items=(
+        ('TREE', 'Node Tree', 'Store snapshots in the custom properties of the node tree', 'NODETREE', 0),
+        ('FILE', 'Sidecar File', 'Store snapshots in a JSON file next to the blend file', 'FILE', 1),
+        ))
+
+classes = (
+    NodetreeUtilsProperties,
+    NODEUTILS_OT_SELECT_BY_TYPE,
+    NODEUTILS_OT_NORMALIZE_NODE_WIDTH,
+    NODEUTILS_OT_BATCH_LABEL,
+    NODEUTILS_OT_SET_WIDTH,
+    NODEUTILS_OT_SET_COLOR,
+    NODEUTILS_OT_LABEL_REROUTES,
+    NODEUTILS_OT_RECENTER_NODES,
+    NODEUTILS_OT_TOGGLE_UNUSED_SOCKETS,
+    NODEUTILS_OT_ENABLE_PERFORMANCE_MODE,
+    NODEUTILS_OT_RESTORE_PERFORMANCE_MODE,
+    NODEUTILS_OT_SWITCH_SELECT_TYPE,
+    NODEUTILS_OT_SWITCH_VIEWER_DOMAIN,
+    NODEUTILS_OT_PIE_MENU_SWITCH_VIEWER_DOMAIN,
+    NODEUTILS_MT_SWITCH_VIEWER_DOMAIN_OPTIONS,
+    NODEUTILS_OT_SWITCH_VIEWER_DOMAIN_INVOKE_MENU,
+    NODEUTILS_OT_STRAIGHTEN_REROUTES,
+    NODEUTILS_OT_COLLAPSE_REROUTES,
+    NODEUTILS_OT_MERGE_DUPLICATE_NODES,
+    NODEUTILS_OT_DIFF_TREES,
+    NODEUTILS_OT_FIND_REPEATED_SUBGRAPHS,
+    NODEUTILS_OT_FACTOR_REPEATED_SUBGRAPH,
+    NODEUTILS_OT_PROFILE_TREE,
+    NODEUTILS_OT_EXPORT_PROFILE,
+    NODEUTILS_OT_ANALYZE_TREES,
+    NODEUTILS_OT_SELECT_FRAME_CONTENTS,
+    NODEUTILS_OT_SHRINK_FRAMES,
+    NODEUTILS_OT_FRAME_APPLY,
+    NODEUTILS_OT_AUTO_LAYOUT,
+    NODEUTILS_OT_ALIGN_NODES,
+    NODEUTILS_OT_DISTRIBUTE_NODES,
+    NODEUTILS_OT_SEARCH_NODES,
+    NODEUTILS_OT_FIT_NODE_WIDTH,
+    NODEUTILS_OT_SAVE_LAYOUT,
+    NODEUTILS_OT_RESTORE_LAYOUT,
+    NODEUTILS_OT_DELETE_LAYOUT,
+    NODEUTILS_OT_EXPORT_TREES,
+    NODEUTILS_OT_IMPORT_TREES,
+    NODEUTILS_OT_SAVE_SELECTION_SET,
+    NODEUTILS_OT_RECALL_SELECTION_SET,
+    NODEUTILS_OT_DELETE_SELECTION_SET,
+    NODEUTILS_OT_SELECTION_HISTORY,
+    NODEUTILS_OT_COPY_FROM_ACTIVE,
+    NODEUTILS_OT_RUN_ACROSS_TREES,
+)
+
+def register():
+    for cls in classes:
+        bpy.utils.register_class(cls)
+    
+    bpy.types.WindowManager.nd_utils_props = bpy.props.PointerProperty(type=NodetreeUtilsProperties)
+    bpy.app.handlers.depsgraph_update_post.append(search_index_depsgraph_handler)
+    bpy.app.handlers.load_post.append(search_index_load_handler)
+    bpy.app.handlers.load_post.append(selection_history_load_handler)
+    bpy.app.handlers.load_post.append(analysis_cache_load_handler)
+    bpy.app.handlers.load_pre.append(viewer_domain_load_handler)
+    for handler_list in (bpy.app.handlers.load_post, bpy.app.handlers.undo_post, bpy.app.handlers.redo_post):
+        handler_list.append(tree_path_cache_handler)
+
+def unregister():
+    for cls in classes:
+        bpy.utils.unregister_class(cls)
+
+    bpy.app.handlers.depsgraph_update_post.remove(search_index_depsgraph_handler)
+    bpy.app.handlers.load_post.remove(search_index_load_handler)
+    bpy.app.handlers.load_post.remove(selection_history_load_handler)
+    bpy.app.handlers.load_post.remove(analysis_cache_load_handler)
+    bpy.app.handlers.load_pre.remove(viewer_domain_load_handler)
+    for handler_list in (bpy.app.handlers.load_post, bpy.app.handlers.undo_post, bpy.app.handlers.redo_post):
+        handler_list.remove(tree_path_cache_handler)
+    tree_path_cache.clear()
+    viewer_domain_load_handler(None)
+    search_index_load_handler(None)
+    selection_history_load_handler(None)
     
     del bpy.types.WindowManager.nd_utils_props 
\ No newline at end of file
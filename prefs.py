@@ -1,6 +1,7 @@
 import bpy
-from bpy.props import EnumProperty, BoolProperty, IntVectorProperty
+from bpy.props import EnumProperty, BoolProperty, IntVectorProperty, FloatProperty, StringProperty, IntProperty
 from .keymaps import addon_keymaps, prefs_display
+from .operators import set_auto_label_reroutes, update_auto_label_reroutes, set_auto_collapse_offscreen, update_auto_collapse_offscreen
 from . import keymap_ui
 
 class NodetreeUtilsPreferences(bpy.types.AddonPreferences):
@@ -31,6 +32,65 @@ class NodetreeUtilsPreferences(bpy.types.AddonPreferences):
         default="TEXT AND ICON",
         description="Specifies how to display switch buttons are displayed")
 
+    auto_label_reroutes: BoolProperty(
+        name="Auto Label Reroutes",
+        default=False,
+        update=update_auto_label_reroutes,
+        description="Relabels reroute chains by their input whenever their links change")
+
+    auto_label_delay: FloatProperty(
+        name="Delay",
+        default=0.3,
+        min=0.05, max=5.0,
+        subtype='TIME',
+        unit='TIME',
+        description="How long links must stay unchanged before reroutes are relabeled")
+
+    coalesce_delay: FloatProperty(
+        name="Viewer Domain Delay",
+        default=0.25,
+        min=0.0, max=2.0,
+        subtype='TIME',
+        unit='TIME',
+        description="How long to wait after the last viewer domain switch before applying it. Zero applies every switch immediately")
+
+    auto_collapse_offscreen: BoolProperty(
+        name="Collapse Off-Screen Nodes",
+        default=False,
+        update=update_auto_collapse_offscreen,
+        description="Collapses nodes far outside of the visible node editors and expands them again as they come into view. Collapsing marks the file as modified, nodes are expanded again before saving")
+
+    collapse_margin: FloatProperty(
+        name="Margin",
+        default=400.0,
+        min=0.0, max=5000.0,
+        description="Distance around the view within which collapsed nodes are expanded again. Nodes are collapsed at twice this distance")
+
+    heavy_node_types: StringProperty(
+        name="Heavy Node Types",
+        default="CompositorNodeDefocus, CompositorNodeGlare, CompositorNodeDenoise, ShaderNodeBevel, ShaderNodeAmbientOcclusion",
+        description="Comma separated node types that Performance Mode mutes")
+
+    heavy_sample_threshold: IntProperty(
+        name="Minimum Samples",
+        default=8,
+        min=1, max=128,
+        description="Heavy nodes with a sample count, like Bevel and Ambient Occlusion, are only muted from this many samples on")
+
+    analysis_cache_location: EnumProperty(
+        name="Analysis Cache",
+        items=(
+            ("USER", "User Folder", "Keep cached analyses in the Blender user data folder"),
+            ("BLEND", "Next to Blend File", "Keep cached analyses in a folder next to the blend file")
+        ),
+        default="USER",
+        description="Where results of Analyze All Trees are cached between sessions")
+
+    analysis_cache_size: IntProperty(
+        name="Cache Size (MB)",
+        default=256,
+        min=1, max=65536,
+        description="Least recently used cache entries are removed once the cache grows beyond this size")
 
     custom_color: bpy.props.FloatVectorProperty (
         name = "Custom Color",
@@ -52,12 +112,34 @@ class NodetreeUtilsPreferences(bpy.types.AddonPreferences):
         split = row.split()
         split.alignment = 'RIGHT'
         split.prop(self, "display_mode", text='')
+        row = col.row()
+        row.prop(self, "auto_label_reroutes")
+        split = row.split()
+        split.active = self.auto_label_reroutes
+        split.prop(self, "auto_label_delay")
+        col.prop(self, "coalesce_delay")
+        row = col.row()
+        row.prop(self, "auto_collapse_offscreen")
+        split = row.split()
+        split.active = self.auto_collapse_offscreen
+        split.prop(self, "collapse_margin")
+        row = col.row()
+        row.prop(self, "heavy_node_types")
+        row.prop(self, "heavy_sample_threshold")
+        row = col.row()
+        row.prop(self, "analysis_cache_location")
+        row.prop(self, "analysis_cache_size")
         
         keymap_ui.draw_keyboard_shorcuts(
             layout=layout, spacing=keymap_spacing, keymaps=addon_keymaps, display=prefs_display)
 
 def register():
     bpy.utils.register_class(NodetreeUtilsPreferences)
+    pref = bpy.context.preferences.addons[__package__].preferences
+    set_auto_label_reroutes(pref.auto_label_reroutes)
+    set_auto_collapse_offscreen(pref.auto_collapse_offscreen)
 
 def unregister():
+    set_auto_label_reroutes(False)
+    set_auto_collapse_offscreen(False)
     bpy.utils.unregister_class(NodetreeUtilsPreferences)
\ No newline at end of file
@@ -0,0 +1,321 @@
+# Tree analyses that only work on plain python snapshots of node trees.
+# Nothing in here may import bpy, worker processes import this module on their own.
+import itertools
+import time
+from collections import Counter
+
+def compute_tree_metrics(snapshot, hotspot_count=5):
+    names = snapshot["names"]
+    types = snapshot["types"]
+    count = len(names)
+
+    fan_in = [0] * count
+    fan_out = [0] * count
+    children = [[] for _ in range(count)]
+    for from_id, to_id in snapshot["links"]:
+        fan_out[from_id] += 1
+        fan_in[to_id] += 1
+        children[from_id].append(to_id)
+
+    depth = [0] * count
+    remaining = fan_in[:]
+    queue = [i for i in range(count) if remaining[i] == 0]
+    for i in queue:
+        for j in children[i]:
+            depth[j] = max(depth[j], depth[i] + 1)
+            remaining[j] -= 1
+            if remaining[j] == 0:
+                queue.append(j)
+
+    reroutes = set(i for i in range(count) if types[i] == 'REROUTE')
+    reroute_links = sum(1 for from_id, to_id in snapshot["links"] if from_id in reroutes or to_id in reroutes)
+
+    def hotspots(degrees):
+        ranked = sorted(range(count), key=lambda i: degrees[i], reverse=True)[:hotspot_count]
+        return [(names[i], degrees[i]) for i in ranked if degrees[i] > 0]
+
+    return {
+        "tree": snapshot["tree"],
+        "node_count": count,
+        "link_count": len(snapshot["links"]),
+        "max_depth": max(depth, default=0),
+        "type_counts": dict(Counter(snapshot["idnames"]).most_common()),
+        "fan_in_hotspots": hotspots(fan_in),
+        "fan_out_hotspots": hotspots(fan_out),
+        "reroute_count": len(reroutes),
+        "reroute_link_count": reroute_links,
+        "reroute_ratio": len(reroutes) / count if count else 0.0,
+    }
+
+
+def layered_layout(widths, heights, edges, groups=None, spacing_x=80.0, spacing_y=40.0, sweeps=4):
+    # Sugiyama-style layout: longest-path layering, barycenter sweeps over layers padded with dummy
+    # nodes for long edges, then column/stack coordinate assignment. Returns top-left positions with
+    # the origin at the top-left of the layout and y pointing up, like node locations.
+    count = len(widths)
+    successors = [[] for _ in range(count)]
+    predecessors = [[] for _ in range(count)]
+    for from_id, to_id in edges:
+        if from_id != to_id:
+            successors[from_id].append(to_id)
+            predecessors[to_id].append(from_id)
+
+    remaining = [len(preds) for preds in predecessors]
+    order = [i for i in range(count) if remaining[i] == 0]
+    for i in order:
+        for j in successors[i]:
+            remaining[j] -= 1
+            if remaining[j] == 0:
+                order.append(j)
+    if len(order) < count:
+        # Nodes stuck in cycles keep their edges, but only those going forward in this order count for layering
+        ordered = set(order)
+        order.extend(i for i in range(count) if i not in ordered)
+
+    rank = [0] * count
+    for position, i in enumerate(order):
+        rank[i] = position
+
+    layer = [0] * count
+    for i in order:
+        for j in successors[i]:
+            if rank[j] > rank[i]:
+                layer[j] = max(layer[j], layer[i] + 1)
+
+    # Pull nodes to the right, next to their earliest consumer, to keep edges short
+    for i in reversed(order):
+        consumer_layers = [layer[j] for j in successors[i] if rank[j] > rank[i]]
+        if consumer_layers:
+            layer[i] = max(layer[i], min(consumer_layers) - 1)
+
+    total = count
+    node_layer = layer[:]
+    upper = [[] for _ in range(count)]
+    lower = [[] for _ in range(count)]
+    for from_id, to_id in edges:
+        if node_layer[to_id] <= node_layer[from_id]:
+            continue
+        previous = from_id
+        for dummy_layer in range(node_layer[from_id] + 1, node_layer[to_id]):
+            node_layer.append(dummy_layer)
+            upper.append([previous])
+            lower.append([])
+            lower[previous].append(total)
+            previous = total
+            total += 1
+        upper[to_id].append(previous)
+        lower[previous].append(to_id)
+
+    layers = [[] for _ in range(max(node_layer, default=-1) + 1)]
+    for i in itertools.chain(order, range(count, total)):
+        layers[node_layer[i]].append(i)
+
+    position = [0] * total
+    for layer_nodes in layers:
+        for index, i in enumerate(layer_nodes):
+            position[i] = index
+
+    def sort_layer(layer_nodes, neighbors):
+        barycenters = {}
+        for i in layer_nodes:
+            adjacent = neighbors[i]
+            barycenters[i] = sum(position[j] for j in adjacent) / len(adjacent) if adjacent else position[i]
+
+        if groups is not None:
+            # Keep members of the same frame next to each other
+            group_members = {}
+            for i in layer_nodes:
+                if i < count and groups[i] is not None:
+                    group_members.setdefault(groups[i], []).append(barycenters[i])
+            group_centers = {group: sum(values) / len(values) for group, values in group_members.items()}
+            def sort_key(i):
+                group = groups[i] if i < count else None
+                return (group_centers[group] if group is not None else barycenters[i], barycenters[i])
+        else:
+            sort_key = barycenters.get
+
+        layer_nodes.sort(key=sort_key)
+        for index, i in enumerate(layer_nodes):
+            position[i] = index
+
+    for _ in range(sweeps):
+        for layer_nodes in layers[1:]:
+            sort_layer(layer_nodes, upper)
+        for layer_nodes in reversed(layers[:-1]):
+            sort_layer(layer_nodes, lower)
+
+    dummy_height = spacing_y * 0.5
+    def height(i):
+        return heights[i] if i < count else dummy_height
+
+    column_x = []
+    x = 0.0
+    for layer_nodes in layers:
+        column_x.append(x)
+        x += max((widths[i] for i in layer_nodes if i < count), default=0.0) + spacing_x
+
+    y = [0.0] * total
+    for layer_nodes in layers:
+        cursor = None
+        for i in layer_nodes:
+            adjacent = upper[i]
+            if adjacent:
+                target = sum(y[j] - 0.5*height(j) for j in adjacent) / len(adjacent) + 0.5*height(i)
+            else:
+                target = 0.0 if cursor is None else cursor
+            if cursor is not None:
+                target = min(target, cursor)
+            y[i] = target
+            cursor = target - height(i) - spacing_y
+
+    top = max(y[:count], default=0.0)
+    return [(column_x[node_layer[i]], y[i] - top) for i in range(count)]
+
+
+analysis_output_types = ('OUTPUT_MATERIAL', 'OUTPUT_WORLD', 'OUTPUT_LIGHT', 'OUTPUT_AOV', 'OUTPUT_LINESTYLE',
+    'GROUP_OUTPUT', 'COMPOSITE', 'OUTPUT_FILE', 'VIEWER', 'SPLITVIEWER', 'OUTPUT')
+
+def resolve_reroutes(snapshot):
+    # Maps every reroute to the first node feeding its chain that is not a reroute, or None when unconnected
+    types = snapshot["types"]
+    source = {}
+    for from_id, to_id in snapshot["links"]:
+        if types[to_id] == 'REROUTE':
+            source[to_id] = from_id
+
+    resolved = {}
+    for i in range(len(types)):
+        if types[i] != 'REROUTE' or i in resolved:
+            continue
+        chain = []
+        current = i
+        while current is not None and types[current] == 'REROUTE' and current not in resolved and current not in chain:
+            chain.append(current)
+            current = source.get(current)
+        if current is not None and types[current] == 'REROUTE':
+            current = resolved.get(current)
+        for reroute in chain:
+            resolved[reroute] = current
+    return resolved
+
+def unreachable_nodes(snapshot):
+    # Nodes with no path to any output node, which therefore never affect the result
+    types = snapshot["types"]
+    parents = [[] for _ in types]
+    for from_id, to_id in snapshot["links"]:
+        parents[to_id].append(from_id)
+
+    reached = [node_type in analysis_output_types for node_type in types]
+    stack = [i for i, is_output in enumerate(reached) if is_output]
+    while stack:
+        for j in parents[stack.pop()]:
+            if not reached[j]:
+                reached[j] = True
+                stack.append(j)
+    return [i for i, is_reached in enumerate(reached) if not is_reached and types[i] != 'FRAME']
+
+def node_kind_buckets(snapshot):
+    buckets = {}
+    for i, idname in enumerate(snapshot["idnames"]):
+        buckets.setdefault(idname, []).append(i)
+    return buckets
+
+def socket_layout(snapshot):
+    # One row per socket: node index, 0 for inputs or 1 for outputs, position on the node and type code
+    type_names = sorted(set(socket_type for sides in snapshot["sockets"] for socket_type in itertools.chain(*sides)))
+    codes = {name: i for i, name in enumerate(type_names)}
+    rows = [(i, side, position, codes[socket_type]) for i, sides in enumerate(snapshot["sockets"])
+        for side, socket_types in enumerate(sides) for position, socket_type in enumerate(socket_types)]
+    return {"types": type_names, "rows": rows}
+
+def frame_bounds(snapshot):
+    # Bounds (left, top, right, bottom) of the contents of every frame, innermost frames first.
+    # Locations in the snapshot are absolute, so only the nesting is needed. Empty frames get None.
+    names = snapshot["names"]
+    types = snapshot["types"]
+    locations = snapshot["locations"]
+    sizes = snapshot["sizes"]
+    index = {name: i for i, name in enumerate(names)}
+    parent_ids = [index.get(parent) for parent in snapshot["parents"]]
+
+    children = {}
+    for i, parent in enumerate(parent_ids):
+        if parent is not None:
+            children.setdefault(parent, []).append(i)
+
+    def depth(i):
+        seen = set()
+        while parent_ids[i] is not None and i not in seen:
+            seen.add(i)
+            i = parent_ids[i]
+        return len(seen)
+
+    bounds = {}
+    for frame in sorted((i for i, node_type in enumerate(types) if node_type == 'FRAME'), key=depth, reverse=True):
+        child_bounds = []
+        for child in children.get(frame, ()):
+            if types[child] == 'FRAME':
+                if bounds.get(child) is not None:
+                    child_bounds.append(bounds[child])
+            else:
+                left, top = locations[2*child], locations[2*child + 1]
+                child_bounds.append((left, top, left + sizes[2*child], top - sizes[2*child + 1]))
+        bounds[frame] = (min(b[0] for b in child_bounds), max(b[1] for b in child_bounds),
+            max(b[2] for b in child_bounds), min(b[3] for b in child_bounds)) if child_bounds else None
+    return list(bounds.items())
+
+# Analyses are cached in independent parts, each listing the snapshot fields it reads and the results
+# it produces, so that moving or resizing nodes only invalidates the frame bounds
+analysis_parts = {
+    "structure": (("names", "types", "idnames", "groups", "links"), ("metrics", "reroutes", "unreachable", "kinds")),
+    "sockets": (("sockets",), ("sockets",)),
+    "frames": (("names", "types", "parents", "locations", "sizes"), ("frames",)),
+}
+
+def analyze_snapshot(snapshot, layout_settings=None, parts=None):
+    # Runs the analyses of the given parts, all by default, on a plain snapshot.
+    # Has to stay free of bpy so it can run in worker processes.
+    parts = analysis_parts if parts is None else parts
+    timings = {}
+    result = {"tree": snapshot["tree"]}
+
+    if "structure" in parts:
+        start = time.perf_counter()
+        result["metrics"] = compute_tree_metrics(snapshot)
+        timings["metrics"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        result["reroutes"] = resolve_reroutes(snapshot)
+        timings["reroutes"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        result["unreachable"] = unreachable_nodes(snapshot)
+        timings["reachability"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        result["kinds"] = node_kind_buckets(snapshot)
+        timings["kinds"] = time.perf_counter() - start
+
+    if "sockets" in parts:
+        start = time.perf_counter()
+        result["sockets"] = socket_layout(snapshot)
+        timings["sockets"] = time.perf_counter() - start
+
+    if "frames" in parts:
+        start = time.perf_counter()
+        result["frames"] = frame_bounds(snapshot)
+        timings["frames"] = time.perf_counter() - start
+
+    if layout_settings is not None:
+        start = time.perf_counter()
+        layout_ids = [i for i, node_type in enumerate(snapshot["types"]) if node_type != 'FRAME']
+        index = {i: j for j, i in enumerate(layout_ids)}
+        sizes = snapshot["sizes"]
+        edges = [(index[from_id], index[to_id]) for from_id, to_id in snapshot["links"] if from_id in index and to_id in index]
+        positions = layered_layout([sizes[2*i] for i in layout_ids], [sizes[2*i + 1] for i in layout_ids], edges,
+            [snapshot["parents"][i] for i in layout_ids], **layout_settings)
+        result["layout"] = (layout_ids, positions)
+        timings["layout"] = time.perf_counter() - start
+
+    result["timings"] = timings
+    return result
@@ -10,11 +10,42 @@ from .operators import (
     NODEUTILS_OT_LABEL_REROUTES,
     NODEUTILS_OT_RECENTER_NODES,
     NODEUTILS_OT_TOGGLE_UNUSED_SOCKETS,
+    NODEUTILS_OT_ENABLE_PERFORMANCE_MODE,
+    NODEUTILS_OT_RESTORE_PERFORMANCE_MODE,
     NODEUTILS_OT_SWITCH_SELECT_TYPE,
     NODEUTILS_OT_SWITCH_VIEWER_DOMAIN,
     NODEUTILS_OT_PIE_MENU_SWITCH_VIEWER_DOMAIN,
     NODEUTILS_MT_SWITCH_VIEWER_DOMAIN_OPTIONS,
-    fetch_user_preferences
+    NODEUTILS_OT_COLLAPSE_REROUTES,
+    NODEUTILS_OT_MERGE_DUPLICATE_NODES,
+    NODEUTILS_OT_DIFF_TREES,
+    NODEUTILS_OT_ANALYZE_TREES,
+    NODEUTILS_OT_FIND_REPEATED_SUBGRAPHS,
+    NODEUTILS_OT_FACTOR_REPEATED_SUBGRAPH,
+    NODEUTILS_OT_PROFILE_TREE,
+    NODEUTILS_OT_EXPORT_PROFILE,
+    NODEUTILS_OT_SELECT_FRAME_CONTENTS,
+    NODEUTILS_OT_SHRINK_FRAMES,
+    NODEUTILS_OT_FRAME_APPLY,
+    NODEUTILS_OT_AUTO_LAYOUT,
+    NODEUTILS_OT_ALIGN_NODES,
+    NODEUTILS_OT_DISTRIBUTE_NODES,
+    NODEUTILS_OT_SEARCH_NODES,
+    NODEUTILS_OT_FIT_NODE_WIDTH,
+    NODEUTILS_OT_SAVE_LAYOUT,
+    NODEUTILS_OT_RESTORE_LAYOUT,
+    NODEUTILS_OT_DELETE_LAYOUT,
+    NODEUTILS_OT_EXPORT_TREES,
+    NODEUTILS_OT_IMPORT_TREES,
+    NODEUTILS_OT_SAVE_SELECTION_SET,
+    NODEUTILS_OT_RECALL_SELECTION_SET,
+    NODEUTILS_OT_DELETE_SELECTION_SET,
+    NODEUTILS_OT_SELECTION_HISTORY,
+    NODEUTILS_OT_COPY_FROM_ACTIVE,
+    NODEUTILS_OT_RUN_ACROSS_TREES,
+    fetch_user_preferences,
+    get_tree,
+    profiler_results,
 )
 
 class NODEUTILS_PT_main_panel(Panel):
@@ -27,6 +58,7 @@ class NODEUTILS_PT_main_panel(Panel):
         prefs = fetch_user_preferences()
 
         layout = self.layout
+        layout.operator('nd_utils.search_nodes', text='Search Nodes', icon='VIEWZOOM')
         layout.label(text="Select by Type:")
         box = layout.box()
         col = box.column(align=True)
@@ -41,6 +73,20 @@ class NODEUTILS_PT_main_panel(Panel):
         op_props = row.operator('nd_utils.select_by_type', text='Frames')
         op_props.select_target = "FRAMES"
 
+        col = box.column(align=True)
+        col.label(text="Selection Sets:")
+        col.separator(factor=0.5)
+        row = col.row(align=True)
+        row.prop(context.window_manager.nd_utils_props, "selection_set_name", text="")
+        row.operator('nd_utils.save_selection_set', text='', icon='ADD')
+        row = col.row(align=True)
+        row.operator_menu_enum('nd_utils.recall_selection_set', "selection_set", text='Recall', icon='RESTRICT_SELECT_OFF')
+        row.operator_menu_enum('nd_utils.delete_selection_set', "selection_set", text='', icon='TRASH')
+        op_props = row.operator('nd_utils.selection_history', text='', icon='TRIA_LEFT')
+        op_props.direction = 'BACK'
+        op_props = row.operator('nd_utils.selection_history', text='', icon='TRIA_RIGHT')
+        op_props.direction = 'FORWARD'
+
 
         if prefs.display_switch_buttons:
             col = box.column(align=True)
@@ -66,6 +112,11 @@ class NODEUTILS_PT_main_panel(Panel):
 
         op_props = row.operator('nd_utils.normalize_node_width', text='By Average')
         op_props.normalize_type = "AVERAGE"
+        row = row.row(align=True)
+        op_props = row.operator('nd_utils.fit_node_width', text='Fit')
+        op_props.normalize = "NONE"
+        op_props = row.operator('nd_utils.fit_node_width', text='', icon='SEQ_STRIP_META')
+        op_props.normalize = "COLUMN"
 
         layout.label(text="Label Reroutes by Links:")
         row = layout.box().row(align=True)
@@ -81,6 +132,11 @@ class NODEUTILS_PT_main_panel(Panel):
         op_props = row.operator('nd_utils.toggle_unused_sockets', text='Outputs')
         op_props.sockets_to_hide = "OUTPUT"
 
+        layout.label(text="Performance Mode:")
+        row = layout.box().row(align=True)
+        row.operator('nd_utils.enable_performance_mode', text='Enable')
+        row.operator('nd_utils.restore_performance_mode', text='Restore')
+
         if context.space_data.tree_type == "GeometryNodeTree":
             layout.label(text="Switch Viewer Node Domains:")
             row = layout.box().row(align=True)
@@ -95,6 +151,44 @@ class NODEUTILS_PT_main_panel(Panel):
         row = layout.box().row(align=True)
         op_props = row.operator('nd_utils.straighten_reroutes', text='Straighten Reroutes')
         #op_props.sockets_to_hide = "OUTPUT"
+        row = layout.box().row(align=True)
+        row.operator('nd_utils.collapse_reroutes', text='Collapse Reroutes')
+
+        layout.label(text="Align and Distribute:")
+        col = layout.box().column(align=True)
+        row = col.row(align=True)
+        align_icons = ('ALIGN_LEFT', 'ALIGN_CENTER', 'ALIGN_RIGHT', 'ALIGN_TOP', 'ALIGN_MIDDLE', 'ALIGN_BOTTOM')
+        align_props = ('LEFT', 'CENTER_X', 'RIGHT', 'TOP', 'CENTER_Y', 'BOTTOM')
+        for icon, prop in zip(align_icons, align_props):
+            op_props = row.operator('nd_utils.align_nodes', text='', icon=icon)
+            op_props.align_mode = prop
+        row = col.row(align=True)
+        distribute_names = ('Gaps X', 'Gaps Y', 'Centers X', 'Centers Y', 'Grid')
+        distribute_props = ('GAPS_X', 'GAPS_Y', 'CENTERS_X', 'CENTERS_Y', 'GRID')
+        for name, prop in zip(distribute_names, distribute_props):
+            op_props = row.operator('nd_utils.distribute_nodes', text=name)
+            op_props.distribute_mode = prop
+
+        layout.label(text="Frames:")
+        col = layout.box().column(align=True)
+        row = col.row(align=True)
+        row.operator('nd_utils.select_frame_contents', text='Select Contents')
+        row.operator('nd_utils.shrink_frames', text='Shrink to Fit')
+        row = col.row(align=True)
+        for name, prop in (('Max', 'NORMALIZE_MAX'), ('Min', 'NORMALIZE_MIN'), ('Average', 'NORMALIZE_AVERAGE'), ('Recenter', 'RECENTER')):
+            op_props = row.operator('nd_utils.frame_apply', text=name)
+            op_props.frame_operation = prop
+
+        layout.label(text="Layout Snapshots:")
+        col = layout.box().column(align=True)
+        props = context.window_manager.nd_utils_props
+        row = col.row(align=True)
+        row.prop(props, "layout_snapshot_name", text="")
+        row.prop(props, "layout_storage", text="", icon_only=True)
+        row.operator('nd_utils.save_layout', text='', icon='FILE_TICK')
+        row = col.row(align=True)
+        row.operator_menu_enum('nd_utils.restore_layout', "snapshot", text='Restore', icon='LOOP_BACK')
+        row.operator_menu_enum('nd_utils.delete_layout', "snapshot", text='', icon='TRASH')
 
         layout.label(text="Batch Operations:")
         spacing = 0.55
@@ -103,6 +197,8 @@ class NODEUTILS_PT_main_panel(Panel):
         col.separator(factor=spacing)
         col.operator('nd_utils.set_node_width')
         col.separator(factor=spacing)
+        col.operator('nd_utils.copy_from_active', text='Copy from Active')
+        col.separator(factor=spacing)
         row = col.row(align=True)
         op_props = row.operator('nd_utils.set_node_color', text='Set Color') 
         op_props.color_opmode = "SET_COLOR"
@@ -112,11 +208,95 @@ class NODEUTILS_PT_main_panel(Panel):
         col.separator(factor=spacing)
         col.operator('nd_utils.recenter_nodes', text='Center at Origin')
         col.separator(factor=spacing)
+        row = col.row(align=True)
+        row.operator('nd_utils.export_trees', text='Export', icon='EXPORT')
+        row.operator('nd_utils.import_trees', text='Import', icon='IMPORT')
+        col.separator(factor=spacing)
+        col.operator('nd_utils.auto_layout', text='Auto Layout')
+        col.separator(factor=spacing)
+        row = col.row(align=True)
+        op_props = row.operator('nd_utils.merge_duplicate_nodes', text='Merge Duplicates')
+        op_props.dry_run = False
+        op_props = row.operator('nd_utils.merge_duplicate_nodes', text='', icon='VIEWZOOM')
+        op_props.dry_run = True
+        col.separator(factor=spacing)
+        row = col.row(align=True)
+        row.operator('nd_utils.find_repeated_subgraphs', text='Find Repeated')
+        row.operator('nd_utils.factor_repeated_subgraph', text='', icon='NODETREE')
+        col.separator(factor=spacing)
+        row = col.row(align=True)
+        op_props = row.operator('nd_utils.run_across_trees', text='All Editors')
+        op_props.scope = 'EDITORS'
+        op_props = row.operator('nd_utils.run_across_trees', text='All Levels')
+        op_props.scope = 'PATH'
+        col.separator(factor=spacing)
 
-        
+
+
+class NODEUTILS_PT_profiler_panel(Panel):
+    bl_space_type = 'NODE_EDITOR'
+    bl_region_type = 'UI'
+    bl_label = 'Tree Profiler'
+    bl_category = 'Utils'
+    bl_options = {'DEFAULT_CLOSED'}
+
+    @classmethod
+    def poll(cls, context):
+        return context.space_data.node_tree is not None
+
+    def draw(self, context):
+        layout = self.layout
+        row = layout.row(align=True)
+        op_props = row.operator('nd_utils.profile_tree', text='Profile')
+        op_props.heatmap = False
+        op_props = row.operator('nd_utils.profile_tree', text='Heatmap', icon='COLOR')
+        op_props.heatmap = True
+        row.operator('nd_utils.export_profile', text='', icon='EXPORT')
+        layout.operator('nd_utils.analyze_trees', text='Analyze All Trees')
+        row = layout.row(align=True)
+        op_props = row.operator('nd_utils.diff_trees', text='Compare Trees')
+        op_props.highlight = False
+        op_props = row.operator('nd_utils.diff_trees', text='', icon='COLOR')
+        op_props.highlight = True
+
+        profile = profiler_results.get(get_tree(context).name_full)
+        if profile is None:
+            return
+
+        col = layout.box().column(align=True)
+        col.label(text=f"Nodes: {profile['node_count']} ({profile['expanded_node_count']} expanded)")
+        col.label(text=f"Links: {profile['link_count']}")
+        col.label(text=f"Max Depth: {profile['max_depth']}")
+        col.label(text=f"Reroutes: {profile['reroute_count']} ({profile['reroute_ratio']:.0%})")
+        col.label(text=f"Unreachable: {profile['unreachable_count']}, Dangling Reroutes: {profile['dangling_reroute_count']}")
+
+        for title, key in (("Fan-in:", "fan_in_hotspots"), ("Fan-out:", "fan_out_hotspots")):
+            if profile[key]:
+                col.separator()
+                col.label(text=title)
+                for name, degree in profile[key]:
+                    col.label(text=f"{name}: {degree}", icon='DOT')
+
+        if profile["group_instances"]:
+            col.separator()
+            col.label(text="Group Instances:")
+            for name, count in profile["group_instances"].items():
+                col.label(text=f"{name}: {count}", icon='NODETREE')
+
+        col.separator()
+        col.label(text="Node Types:")
+        for idname, count in tuple(profile["type_counts"].items())[:10]:
+            col.label(text=f"{idname}: {count}", icon='NODE')
+
+classes = (
+    NODEUTILS_PT_main_panel,
+    NODEUTILS_PT_profiler_panel,
+)
 
 def register():
-    bpy.utils.register_class(NODEUTILS_PT_main_panel)
+    for cls in classes:
+        bpy.utils.register_class(cls)
 
 def unregister():
-    bpy.utils.unregister_class(NODEUTILS_PT_main_panel)
\ No newline at end of file
+    for cls in classes:
+        bpy.utils.unregister_class(cls)
\ No newline at end of file